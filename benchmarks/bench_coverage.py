@@ -0,0 +1,75 @@
+"""
+Benchmarks the tracker's union-of-rectangles coverage math with synthetic windows.
+
+Run from the repository root:
+    python -m benchmarks.bench_coverage [--windows 50 200 500] [--monitors 3]
+"""
+import argparse
+import random
+import time
+
+from engine import coverage
+
+
+def make_monitors(count, w=1920, h=1080):
+    return [{"id": i, "geometry": {"x": i * w, "y": 0, "w": w, "h": h}} for i in range(count)]
+
+
+def make_windows(count, monitors, rng):
+    span_w = max(m['geometry']['x'] + m['geometry']['w'] for m in monitors)
+    span_h = max(m['geometry']['y'] + m['geometry']['h'] for m in monitors)
+    windows = []
+    for _ in range(count):
+        w = rng.randint(200, 1400)
+        h = rng.randint(150, 900)
+        windows.append((rng.randint(-100, span_w - 100), rng.randint(-50, span_h - 50), w, h))
+    return windows
+
+
+def time_call(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--windows', type=int, nargs='+', default=[10, 50, 200, 500])
+    parser.add_argument('--monitors', type=int, default=3)
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    monitors = make_monitors(args.monitors)
+    print(f"NumPy: {'available' if coverage.np is not None else 'not installed'}")
+    print(f"{'windows':>8} {'sweep ms':>10} {'numpy ms':>10} {'tracker ms':>11}   "
+          f"(all {args.monitors} monitors, best of {args.repeats})")
+
+    for count in args.windows:
+        windows = make_windows(count, monitors, rng)
+        # Like MintpaperTracker, each monitor only gets the windows that touch it
+        rects_by_monitor = {m['id']: [r for r in windows if coverage.clip_rect(r, m['geometry'])]
+                            for m in monitors}
+        clipped = [list({coverage.clip_rect(r, m['geometry']) for r in rects_by_monitor[m['id']]})
+                   for m in monitors]
+
+        sweep = time_call(lambda: [coverage._sweep_union_area(boxes) for boxes in clipped], args.repeats)
+        if coverage.np is not None:
+            arrays = [coverage.np.asarray(boxes, dtype=coverage.np.int64) for boxes in clipped]
+            grid = time_call(lambda: [coverage._grid_union_area(coverage._drop_contained(a)) for a in arrays],
+                             args.repeats)
+            grid_text = f"{grid:10.3f}"
+        else:
+            grid_text = f"{'-':>10}"
+        # What MintpaperTracker pays per recompute once it has the rects, clipping included
+        tracker = time_call(lambda: coverage.coverage_by_monitor(rects_by_monitor, monitors), args.repeats)
+
+        print(f"{count:>8} {sweep:10.3f} {grid_text} {tracker:11.3f}")
+
+
+if __name__ == '__main__':
+    main()
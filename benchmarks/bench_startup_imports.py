@@ -0,0 +1,76 @@
+"""
+Measures what lazy plugin imports save at engine startup.
+
+Each scenario runs in a fresh interpreter so nothing is cached between runs:
+  eager      - what main.py used to do: import every built-in plugin up front
+  registry   - build the registry and resolve the presets actually in use
+
+Run from the repository root:
+    python -m benchmarks.bench_startup_imports [--preset presets/video.mp4] [--runs 7]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+EAGER = """
+import plugins.webview
+import plugins.mp4
+"""
+
+REGISTRY = """
+from engine.registry import default_registry
+registry = default_registry()
+for path in {presets!r}:
+    # The registry only prints import failures; a timing without the plugin would look like a win
+    if registry.resolve(path) is None:
+        raise SystemExit("ImportError: no plugin could be loaded for " + path)
+"""
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{body}
+print(time.perf_counter() - _start)
+"""
+
+
+def run_once(body):
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(body=body)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def measure(body, runs):
+    samples = [run_once(body) for _ in range(runs)]
+    return {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', action='append', dest='presets',
+                        help="Preset path in use (repeatable). Defaults to an mp4-only machine.")
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+    presets = args.presets or ["wallpaper.mp4"]
+
+    results = {"presets": presets}
+    for name, body in (("eager", EAGER), ("registry", REGISTRY.format(presets=presets))):
+        try:
+            results[name] = measure(body, args.runs)
+        except RuntimeError as e:
+            results[name] = {"error": str(e)}
+
+    if "median_ms" in results.get("eager", {}) and "median_ms" in results.get("registry", {}):
+        results["saved_ms"] = round(results["eager"]["median_ms"] - results["registry"]["median_ms"], 1)
+
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == '__main__':
+    main()
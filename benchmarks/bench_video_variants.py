@@ -0,0 +1,120 @@
+"""
+Compares the CPU it takes to decode a video wallpaper against its matched variant.
+
+The variant is made the same way the transcode cache makes it (or passed in
+with --variant). Both files are then decoded by ffmpeg with no output, and the
+CPU time of the decoder is reported per second of video, which is what mpv
+pays to keep the wallpaper playing in real time.
+
+Run from the repository root (needs ffmpeg/ffprobe):
+    python -m benchmarks.bench_video_variants wallpaper.mp4 [--screen 1920x1080] [--fps 30]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+
+from engine import transcode
+
+
+def decode_cost(path, seconds, hwaccel):
+    """(CPU seconds, wall seconds) to decode the first `seconds` of a file as fast as possible."""
+    command = ["ffmpeg", "-hide_banner", "-v", "error", "-nostdin"]
+    if hwaccel:
+        command += ["-hwaccel", hwaccel]
+    command += ["-t", str(seconds), "-i", path, "-an", "-f", "null", "-"]
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu, wall
+
+
+def measure(path, seconds, runs, hwaccel):
+    info = transcode.probe(path) or {}
+    video_s = min(seconds, info.get("duration") or seconds)
+    costs = [decode_cost(path, seconds, hwaccel) for _ in range(runs)]
+    cpu = statistics.median(c[0] for c in costs)
+    return {
+        "file": path,
+        "size": f"{info.get('width')}x{info.get('height')}",
+        "fps": info.get("fps"),
+        "mb": round(os.path.getsize(path) / (1024 * 1024), 1),
+        "cpu_s": round(cpu, 3),
+        "wall_s": round(statistics.median(c[1] for c in costs), 3),
+        # Share of one core spent decoding while playing at normal speed
+        "realtime_cpu_percent": round(cpu / video_s * 100, 1) if video_s else None,
+    }
+
+
+def make_variant(src, screen, fps, out_dir):
+    info = transcode.probe(src)
+    if not info:
+        raise SystemExit(f"Couldn't probe {src}")
+    size = transcode.target_size((info["width"], info["height"]), screen)
+    keep_fps = info["fps"] and fps >= info["fps"]
+    if size is None and keep_fps:
+        raise SystemExit(f"{src} is already no larger than {screen[0]}x{screen[1]}@{fps}; nothing to compare")
+
+    dst = os.path.join(out_dir, f"variant-{screen[0]}x{screen[1]}-{fps}.mp4")
+    options = dict(transcode.DEFAULT_OPTIONS)
+    start = time.perf_counter()
+    subprocess.run(transcode.ffmpeg_command(src, dst, size, None if keep_fps else fps, options), check=True)
+    print(f"Transcoded in {time.perf_counter() - start:.1f}s -> {dst}")
+    return dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('video')
+    parser.add_argument('--screen', default='1920x1080', metavar='WxH', help="monitor size in device pixels")
+    parser.add_argument('--fps', type=int, default=30, help="the monitor's fps limit")
+    parser.add_argument('--variant', help="compare against this file instead of transcoding one")
+    parser.add_argument('--seconds', type=float, default=20, help="how much of each file to decode")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--hwaccel', help="e.g. vaapi; default is software decoding")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    w, h = args.screen.lower().split('x')
+    screen = (int(w), int(h))
+
+    with tempfile.TemporaryDirectory(prefix="mintpaper-bench-") as out_dir:
+        variant = args.variant or make_variant(args.video, screen, args.fps, out_dir)
+        rows = {
+            "original": measure(args.video, args.seconds, args.runs, args.hwaccel),
+            "variant": measure(variant, args.seconds, args.runs, args.hwaccel),
+        }
+
+    before, after = rows["original"]["cpu_s"], rows["variant"]["cpu_s"]
+    results = {
+        "screen": list(screen),
+        "fps_limit": args.fps,
+        "hwaccel": args.hwaccel or "none",
+        **rows,
+        "cpu_saved_percent": round((1 - after / before) * 100, 1) if before else None,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return
+
+    print(f"{'':>9} {'size':>11} {'fps':>7} {'MB':>8} {'cpu s':>8} {'% core':>8}   "
+          f"(first {args.seconds:g}s, median of {args.runs}, hwaccel={results['hwaccel']})")
+    for name, row in rows.items():
+        print(f"{name:>9} {row['size']:>11} {row['fps'] or 0:7.2f} {row['mb']:8.1f} "
+              f"{row['cpu_s']:8.3f} {row['realtime_cpu_percent'] or 0:8.1f}")
+    print(f"Decode CPU saved: {results['cpu_saved_percent']}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""
+Runs every bundled preset and an mp4 fixture headless under Xvfb.
+
+CPU, RSS, achieved frame rate and main-loop latency are recorded per preset.
+Each scenario gets a fresh Python process with MintpaperEngines on a fixed
+virtual monitor layout, so results don't depend on the desktop they're run
+from. Results are written as JSON; pass --baseline to compare them against an
+earlier run and exit non-zero when a metric regressed past --tolerance.
+
+Run from the repository root (needs Xvfb, and xrandr for more than one monitor):
+    python -m benchmarks.run_xvfb [--duration 20] [--layout 1920x1080,1920x1080]
+    python -m benchmarks.run_xvfb --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_xvfb --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+RESULT_PREFIX = "MINTPAPER_BENCH "
+FIXTURE = os.path.join("build", "bench", "fixture-1080p60.mp4")
+
+# metric -> True if bigger is better
+METRICS = {
+    "cpu_percent": False,
+    "rss_mb_mean": False,
+    "rss_mb_peak": False,
+    "fps": True,
+    "loop_latency_p95_ms": False,
+    "first_frame_ms": False,
+}
+# Differences smaller than these are noise, whatever the percentage
+NOISE_FLOOR = {"cpu_percent": 2.0, "rss_mb_mean": 10.0, "rss_mb_peak": 10.0, "fps": 1.0,
+               "loop_latency_p95_ms": 2.0, "first_frame_ms": 50.0}
+
+
+# --- Scenarios ---
+
+def preset_entry(folder):
+    """The page a preset folder is loaded through: index.html, or its only HTML file."""
+    if os.path.isfile(os.path.join(folder, "index.html")):
+        return os.path.join(folder, "index.html")
+    pages = sorted(f for f in os.listdir(folder) if f.endswith((".html", ".htm")))
+    return os.path.join(folder, pages[0]) if pages else None
+
+
+def make_fixture(path):
+    """A 10 s 1080p60 H.264 test pattern, generated once."""
+    if os.path.isfile(path):
+        return path
+    if not shutil.which("ffmpeg"):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=1920x1080:rate=60",
+                    "-t", "10", "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", path],
+                   check=True)
+    return path
+
+
+def scenarios(args):
+    found = {}
+    for name in sorted(os.listdir(args.presets)):
+        folder = os.path.join(args.presets, name)
+        entry = preset_entry(folder) if os.path.isdir(folder) else None
+        if entry:
+            found[name] = entry
+    video = args.video or make_fixture(FIXTURE)
+    if video:
+        found["mp4"] = video
+    else:
+        print("Skipping the mp4 scenario: no --video given and ffmpeg isn't installed to make the fixture.")
+    if args.only:
+        found = {name: path for name, path in found.items() if name in args.only}
+    return found
+
+
+# --- Xvfb ---
+
+def parse_layout(text):
+    """"1920x1080,1280x1024" -> monitors side by side, left to right."""
+    monitors, x = [], 0
+    for part in text.split(','):
+        w, h = (int(v) for v in part.lower().split('x'))
+        monitors.append({"x": x, "y": 0, "w": w, "h": h})
+        x += w
+    return monitors
+
+
+def start_xvfb(monitors):
+    width = sum(m["w"] for m in monitors)
+    height = max(m["h"] for m in monitors)
+    read_fd, write_fd = os.pipe()
+    server = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", f"{width}x{height}x24", "-nolisten", "tcp"],
+        pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    if not number:
+        server.terminate()
+        raise SystemExit("Xvfb didn't start")
+    display = f":{number}"
+
+    if len(monitors) > 1:
+        if not shutil.which("xrandr"):
+            server.terminate()
+            raise SystemExit("xrandr is needed to split the Xvfb screen into several monitors")
+        env = dict(os.environ, DISPLAY=display)
+        for i, m in enumerate(monitors):
+            # RandR 1.5 monitors are what GDK reports; the physical size only affects DPI
+            subprocess.run(["xrandr", "--setmonitor", f"bench-{i}",
+                            f"{m['w']}/{m['w'] // 4}x{m['h']}/{m['h'] // 4}+{m['x']}+{m['y']}", "none"],
+                           env=env, check=True)
+    return server, display
+
+
+# --- Worker (runs inside Xvfb, one per scenario) ---
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_worker(preset, warmup, duration):
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import GLib, Gtk
+    import psutil
+
+    from engine.display import get_monitor_data
+    from engine.registry import default_registry
+    from engine.window import MintpaperEngine
+
+    registry = default_registry()
+    plugin_class = registry.resolve(preset)
+    if plugin_class is None:
+        raise SystemExit(f"No plugin for {preset}")
+
+    engines = []
+    first_frames = {}
+    for mon in get_monitor_data():
+        mon["active_preset_path"] = preset
+        engine = MintpaperEngine(mon)
+        engine.load_plugin(plugin_class, {
+            plugin_class.path_setting: preset,
+            "muted": True,
+            "volume": 0,
+            "fps_limit": mon["fps_limit"],
+            "webkit": {},
+            # Nothing is covered under Xvfb, but never let a scenario fall asleep mid-run
+            "deep_sleep": {},
+        })
+        engines.append(engine)
+
+    process = psutil.Process()
+    rss_samples, lateness, fps_samples = [], [], []
+    window = {}
+
+    def family():
+        """Us plus our helpers (WebKit's web and network processes)."""
+        procs = [process]
+        try:
+            procs += process.children(recursive=True)
+        except psutil.Error:
+            pass
+        return procs
+
+    def cpu_total():
+        total = 0.0
+        for proc in family():
+            try:
+                times = proc.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                pass
+        return total
+
+    def rss_total():
+        total = 0
+        for proc in family():
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    # Page frame counters (webviews) are read asynchronously
+    def read_frames(key):
+        for engine in engines:
+            webview = getattr(engine.plugin, 'webview', None)
+            if webview is None:
+                continue
+
+            def on_result(view, result, user_data, engine=engine):
+                try:
+                    value = view.run_javascript_finish(result).get_js_value()
+                    window.setdefault(key, {})[engine.mon['id']] = value.to_double()
+                except GLib.Error:
+                    pass
+            webview.run_javascript("window.__mintpaper ? window.__mintpaper.frames : 0", None, on_result, None)
+
+    def sample_video_fps():
+        for engine in engines:
+            player = getattr(engine.plugin, 'player', None)
+            if player is not None:
+                try:
+                    fps = player.estimated_vf_fps
+                except Exception:
+                    fps = None
+                if fps:
+                    fps_samples.append(fps)
+
+    # Main-loop latency: how late a 20 ms one-shot timer fires
+    probe_ms = 20
+
+    def arm_probe():
+        expected = time.monotonic() + probe_ms / 1000
+
+        def fired():
+            if "cpu_start" in window and "end" not in window:
+                lateness.append((time.monotonic() - expected) * 1000)
+            arm_probe()
+            return False
+        GLib.timeout_add(probe_ms, fired)
+
+    def sample():
+        if "end" in window:
+            return False
+        rss_samples.append(rss_total())
+        sample_video_fps()
+        return True
+
+    def start_measuring():
+        for engine in engines:
+            if engine.plugin:
+                first_frames[engine.mon['id']] = engine.swap_latencies_ms[0] if engine.swap_latencies_ms else None
+        window["cpu_start"] = cpu_total()
+        window["start"] = time.monotonic()
+        read_frames("frames_start")
+        GLib.timeout_add(500, sample)
+        GLib.timeout_add(int(duration * 1000), stop_measuring)
+        return False
+
+    def stop_measuring():
+        window["end"] = time.monotonic()
+        window["cpu_end"] = cpu_total()
+        read_frames("frames_end")
+        # Give the frame counter replies a moment to come back
+        GLib.timeout_add(500, Gtk.main_quit)
+        return False
+
+    arm_probe()
+    GLib.timeout_add(int(warmup * 1000), start_measuring)
+    Gtk.main()
+
+    elapsed = window["end"] - window["start"]
+    frames = []
+    for mon_id, end in window.get("frames_end", {}).items():
+        begin = window.get("frames_start", {}).get(mon_id)
+        if begin is not None:
+            frames.append((end - begin) / elapsed)
+    fps_values = frames or fps_samples
+    swaps = [ms for ms in first_frames.values() if ms is not None]
+
+    return {
+        "preset": preset,
+        "plugin": plugin_class.__name__,
+        "monitors": len(engines),
+        "ready": sum(1 for e in engines if e.plugin),
+        "duration_s": round(elapsed, 2),
+        # Percent of one core, ours and WebKit's helper processes together
+        "cpu_percent": round((window["cpu_end"] - window["cpu_start"]) / elapsed * 100, 1),
+        "rss_mb_mean": round(statistics.mean(rss_samples), 1) if rss_samples else None,
+        "rss_mb_peak": round(max(rss_samples), 1) if rss_samples else None,
+        "fps": round(statistics.mean(fps_values), 1) if fps_values else None,
+        "fps_source": "page rAF" if frames else ("mpv filter output" if fps_samples else None),
+        "loop_latency_p50_ms": round(percentile(lateness, 50), 2) if lateness else None,
+        "loop_latency_p95_ms": round(percentile(lateness, 95), 2) if lateness else None,
+        "loop_latency_max_ms": round(max(lateness), 2) if lateness else None,
+        "first_frame_ms": round(max(swaps)) if swaps else None,
+    }
+
+
+# --- Comparison ---
+
+def compare(results, baseline, tolerance):
+    """Rows of (scenario, metric, before, after, change %, regressed)."""
+    rows = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "error" in current or "error" in before:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = new < old if higher_is_better else new > old
+            regressed = worse and abs(new - old) > NOISE_FLOOR[metric] and abs(change) > tolerance
+            rows.append((name, metric, old, new, round(change, 1), regressed))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'scenario':<16} {'metric':<22} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, metric, old, new, change, regressed in rows:
+        print(f"{name:<16} {metric:<22} {old:>10} {new:>10} {change:>7}%{'  REGRESSION' if regressed else ''}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--presets', default='presets', help="folder of presets to run")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="run only these scenarios")
+    parser.add_argument('--video', help="mp4 to use instead of the generated fixture")
+    parser.add_argument('--layout', default='1920x1080,1920x1080', help="virtual monitors, left to right")
+    parser.add_argument('--warmup', type=float, default=5, help="seconds before measuring starts")
+    parser.add_argument('--duration', type=float, default=20, help="seconds measured per scenario")
+    parser.add_argument('--out', default=os.path.join('build', 'bench', 'results.json'))
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--save-baseline', metavar='PATH', help="also write the results here")
+    parser.add_argument('--tolerance', type=float, default=10, help="percent change that counts as a regression")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(RESULT_PREFIX + json.dumps(run_worker(args.worker, args.warmup, args.duration)), flush=True)
+        return
+
+    if not shutil.which("Xvfb"):
+        sys.exit("run_xvfb needs Xvfb (apt install xvfb)")
+
+    monitors = parse_layout(args.layout)
+    runs = scenarios(args)
+    server, display = start_xvfb(monitors)
+    # Software GL and no accessibility bus keep runs comparable between machines
+    env = dict(os.environ, DISPLAY=display, GDK_BACKEND="x11", LIBGL_ALWAYS_SOFTWARE="1", NO_AT_BRIDGE="1")
+    env.pop("WAYLAND_DISPLAY", None)
+
+    results = {
+        "meta": {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "layout": args.layout,
+            "warmup_s": args.warmup,
+            "duration_s": args.duration,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name, path in runs.items():
+            print(f"Running {name} ({path}) for {args.duration:g}s...", flush=True)
+            command = [sys.executable, "-m", "benchmarks.run_xvfb", "--worker", path,
+                       "--warmup", str(args.warmup), "--duration", str(args.duration)]
+            try:
+                proc = subprocess.run(command, env=env, capture_output=True, text=True,
+                                      timeout=args.warmup + args.duration + 60)
+                lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+                if lines:
+                    results["scenarios"][name] = json.loads(lines[-1][len(RESULT_PREFIX):])
+                else:
+                    error = (proc.stderr.strip().splitlines() or ["no result"])[-1]
+                    results["scenarios"][name] = {"preset": path, "error": error}
+            except subprocess.TimeoutExpired:
+                results["scenarios"][name] = {"preset": path, "error": "timed out"}
+
+            row = results["scenarios"][name]
+            if "error" in row:
+                print(f"  failed: {row['error']}")
+            else:
+                print(f"  cpu={row['cpu_percent']}% rss={row['rss_mb_mean']} MB fps={row['fps']} "
+                      f"loop p95={row['loop_latency_p95_ms']} ms first frame={row['first_frame_ms']} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
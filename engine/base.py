@@ -1,13 +1,34 @@
+import os
+import time
+from collections import deque
+
+import psutil
+from gi.repository import GLib
+
+from engine.manifest import load_manifest
+
 class MintpaperEvents:
     SET_MUTED = "SET_MUTED"
     SET_PAUSED = "SET_PAUSED"
     # Future events like MOUSE_MOVE can go here
 
 class MintpaperPlugin:
+    # The settings key holding the preset file, e.g. 'html_path'
+    path_setting = None
+    # Key in the "deep_sleep" config section (minutes paused before sleeping); None = never sleeps
+    sleep_kind = None
+
     def __init__(self, engine, settings):
         self.engine = engine      # The MintpaperEngine (the GTK window)
         self.settings = settings  # The dictionary from config.json
         self.is_ready = False
+        self.container = None     # The Gtk.Box page the engine gives this plugin to draw in
+        self.manifest = load_manifest(settings.get(self.path_setting) if self.path_setting else None)
+
+        # Deep sleep: after a long pause the plugin frees its renderer and shows a still
+        self.is_asleep = False
+        self.sleep_reports = deque(maxlen=20)   # {time, before_mb, after_mb}
+        self._sleep_timer = None
 
     def setup(self):
         """Called when the plugin is first loaded. Must return True if successful."""
@@ -15,8 +36,88 @@ class MintpaperPlugin:
 
     def teardown(self):
         """Called when the plugin is being destroyed or swapped."""
-        pass
+        self._cancel_sleep_timer()
+
+    def mark_ready(self):
+        """Plugins call this once their first frame is on screen so the engine can swap them in."""
+        if self.is_ready:
+            return False
+        self.is_ready = True
+        self.engine.on_plugin_ready(self)
+        return False  # Safe to use directly as a GLib.idle_add callback
 
     def handle_event(self, event_type, data):
         """The main pipeline for all state changes (pause, mute, etc)."""
-        pass
\ No newline at end of file
+        pass
+
+    def wants_event(self, event_type):
+        """Lets the engine skip producing input events this plugin would ignore anyway."""
+        return self.manifest.accepts(event_type)
+
+    # --- Deep sleep ---
+
+    def sleep(self):
+        """Release the renderer and show a still. Return False if sleeping isn't possible right now."""
+        return False
+
+    def wake(self):
+        """Rebuild the renderer and pick up where sleep() left off."""
+        pass
+
+    def memory_mb(self):
+        """Resident memory this plugin is responsible for. The default is our own process."""
+        try:
+            return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    def resource_owner(self):
+        """
+        What the watchdog should measure for this plugin: {"pid": ...} for work in
+        another process, {"tids": {...}} for threads inside ours, or None.
+        """
+        return None
+
+    def sleep_delay_s(self):
+        minutes = self.settings.get('deep_sleep', {}).get(self.sleep_kind) if self.sleep_kind else None
+        return int((minutes or 0) * 60)
+
+    def update_sleep(self, paused):
+        """Called by the engine on every pause change: arms the sleep timer, or wakes up."""
+        if paused:
+            delay = self.sleep_delay_s()
+            if delay > 0 and not self.is_asleep and self._sleep_timer is None:
+                self._sleep_timer = GLib.timeout_add_seconds(delay, self._on_sleep_timer)
+            return
+
+        self._cancel_sleep_timer()
+        if self.is_asleep:
+            self.is_asleep = False
+            print(f"Mintpaper: Monitor {self.engine.mon.get('id')} waking from deep sleep.")
+            self.wake()
+
+    def _cancel_sleep_timer(self):
+        if self._sleep_timer is not None:
+            GLib.source_remove(self._sleep_timer)
+            self._sleep_timer = None
+
+    def _on_sleep_timer(self):
+        self._sleep_timer = None
+        before = self.memory_mb()
+        if not self.sleep():
+            return False
+        self.is_asleep = True
+
+        report = {"time": time.time(), "before_mb": before, "after_mb": None}
+        self.sleep_reports.append(report)
+        # Renderer processes and threads take a moment to actually exit
+        GLib.timeout_add_seconds(3, self._measure_after_sleep, report)
+        return False
+
+    def _measure_after_sleep(self, report):
+        report["after_mb"] = self.memory_mb()
+        before, after = report["before_mb"], report["after_mb"]
+        if before is not None and after is not None:
+            print(f"Mintpaper: Monitor {self.engine.mon.get('id')} is in deep sleep: "
+                  f"{before:.1f} MB -> {after:.1f} MB")
+        return False
\ No newline at end of file
@@ -0,0 +1,189 @@
+import json
+import os
+import queue
+import tempfile
+import threading
+
+from gi.repository import GLib
+
+# key -> (accepted types, default, extra check)
+MONITOR_SCHEMA = {
+    "id": (int, 0, None),
+    "name": (str, "Generic Display", None),
+    "isPrimary": (bool, False, None),
+    "geometry": (dict, {"x": 0, "y": 0, "w": 1920, "h": 1080},
+                 lambda g: all(isinstance(g.get(k), int) for k in ("x", "y", "w", "h"))),
+    "orientation": (str, "landscape", lambda v: v in ("landscape", "portrait")),
+    "scale_factor": (int, 1, lambda v: v >= 1),
+    "is_muted": (bool, False, None),
+    "volume": (int, 50, lambda v: 0 <= v <= 100),
+    "performance_mode": (bool, True, None),
+    "fps_limit": (int, 60, lambda v: 1 <= v <= 240),
+    "active_preset_path": (str, "", None),
+}
+
+CONFIG_SCHEMA = {
+    "engine_version": (str, "1.0.0", None),
+    "tracker_mode": (str, "event", lambda v: v in ("event", "poll")),
+    "monitors": (list, [], None),
+    "stats": (dict, {}, None),
+    "webkit": (dict, {}, None),
+    "spanning": (dict, {}, None),
+    "governor": (dict, {}, None),
+    "watchdog": (dict, {}, None),
+    "transcode": (dict, {}, None),
+    "control": (dict, {}, None),
+    "deep_sleep": (dict, {}, lambda v: all(m is None or (isinstance(m, (int, float)) and m >= 0) for m in v.values())),
+}
+
+
+def _check(container, schema, where):
+    """Fixes up a dict in place against a schema. Returns human readable problems."""
+    problems = []
+    for key, (types, default, extra) in schema.items():
+        if key not in container:
+            continue
+        value = container[key]
+        # bool is an int subclass; don't let True pass as an fps limit
+        bad_type = not isinstance(value, types) or (types is int and isinstance(value, bool))
+        if bad_type or (extra is not None and not extra(value)):
+            problems.append(f"{where}.{key}={value!r} is invalid, using {default!r}")
+            container[key] = json.loads(json.dumps(default))
+    return problems
+
+
+def validate(config):
+    """Validates (and repairs) a whole config dict. Returns the list of problems found."""
+    problems = _check(config, CONFIG_SCHEMA, "config")
+    for i, mon in enumerate(config.get("monitors", [])):
+        if not isinstance(mon, dict):
+            problems.append(f"config.monitors[{i}] is not an object")
+            continue
+        problems.extend(_check(mon, MONITOR_SCHEMA, f"config.monitors[{i}]"))
+    config["monitors"] = [m for m in config.get("monitors", []) if isinstance(m, dict)]
+    return problems
+
+
+class MintpaperConfigStore:
+    """
+    The in-memory config model. Engines hold references to their own monitor
+    entry, change it through update(), and hear about changes via subscribe().
+    Saving is debounced on the GTK loop, then written atomically (temp file +
+    rename) on a background thread, so a slider drag costs one write, not hundreds.
+    """
+
+    def __init__(self, path="config.json", debounce_ms=500):
+        self.path = path
+        self.debounce_ms = debounce_ms
+        self.data = {}
+        self._subscribers = []
+        self._save_timer = None
+
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="mintpaper-config", daemon=True)
+        self._writer.start()
+
+    # --- Loading ---
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.data = json.load(f)
+        except FileNotFoundError:
+            self.data = {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Mintpaper: {self.path} is unreadable ({e}). Starting from defaults.")
+            self.data = {}
+
+        if not isinstance(self.data, dict):
+            self.data = {}
+        self.data.setdefault("engine_version", "1.0.0")
+        self.data.setdefault("monitors", [])
+        for problem in validate(self.data):
+            print(f"Mintpaper: {problem}")
+        return self.data
+
+    # --- Changes ---
+
+    def subscribe(self, callback):
+        """callback(entry, key, value) runs on the GTK thread after every update()."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def update(self, entry, key, value):
+        """Sets entry[key] (entry is self.data or a dict inside it), notifies, and schedules a save."""
+        schema = MONITOR_SCHEMA if entry is not self.data else CONFIG_SCHEMA
+        candidate = {key: value}
+        problems = _check(candidate, schema, "update")
+        if problems:
+            print(f"Mintpaper: Rejected config change: {problems[0]}")
+            return False
+        if entry.get(key) == value:
+            return True
+
+        entry[key] = value
+        for callback in list(self._subscribers):
+            callback(entry, key, value)
+        self.schedule_save()
+        return True
+
+    # --- Saving ---
+
+    def schedule_save(self):
+        """Restarts the debounce window; the file is written once changes stop."""
+        if self._save_timer:
+            GLib.source_remove(self._save_timer)
+        self._save_timer = GLib.timeout_add(self.debounce_ms, self._on_save_timer)
+
+    def _on_save_timer(self):
+        self._save_timer = None
+        # Serialize on the GTK thread so the writer never sees a half-mutated dict
+        self._writes.put(json.dumps(self.data, indent=4))
+        return False
+
+    def save_now(self):
+        """Synchronous write, used at startup and on quit."""
+        if self._save_timer:
+            GLib.source_remove(self._save_timer)
+            self._save_timer = None
+        self._atomic_write(json.dumps(self.data, indent=4))
+
+    def flush(self):
+        """Writes any pending debounced change and waits for the writer to drain."""
+        # Through the writer thread, so this can't race a write it's still doing
+        if self._save_timer:
+            GLib.source_remove(self._save_timer)
+            self._save_timer = None
+            self._writes.put(json.dumps(self.data, indent=4))
+        self._writes.join()
+
+    def _write_loop(self):
+        while True:
+            text = self._writes.get()
+            # Only the newest snapshot matters if several queued up
+            while not self._writes.empty():
+                self._writes.task_done()
+                text = self._writes.get()
+            try:
+                self._atomic_write(text)
+            except OSError as e:
+                print(f"Mintpaper: Failed to save {self.path} ({e})")
+            finally:
+                self._writes.task_done()
+
+    def _atomic_write(self, text):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
@@ -0,0 +1,320 @@
+import json
+import os
+import socket
+
+from gi.repository import GLib
+
+from engine.base import MintpaperEvents
+from engine.control_protocol import HELP, default_socket_path
+
+DEFAULT_OPTIONS = {
+    "enabled": True,
+    "path": None,       # default: $XDG_RUNTIME_DIR/mintpaper.sock
+}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MintpaperControlServer:
+    """
+    A Unix socket for looking inside a running engine and driving it without
+    the editor. Each connection sends one command line and gets a text reply;
+    everything runs on the GTK loop, so commands act exactly like the tray
+    and editor do. tools/mintpaperctl.py is the client.
+    """
+
+    def __init__(self, app, options=None):
+        self.app = app
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        self.path = self.options["path"] or default_socket_path()
+        self.commands = 0
+
+        self._server = None
+        self._watch_id = None
+        self._clients = {}      # socket -> (watch id, bytearray: the request, then the unsent reply)
+
+    # --- Socket plumbing ---
+
+    def start(self):
+        if not self.options.get("enabled") or self._server is not None:
+            return False
+
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                print(f"Mintpaper: Another engine is already listening on {self.path}. Control socket disabled.")
+                return False
+            except OSError:
+                # Left behind by an engine that didn't exit cleanly
+                os.unlink(self.path)
+            finally:
+                probe.close()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        except OSError as e:
+            print(f"Mintpaper: Couldn't open the control socket at {self.path} ({e})")
+            server.close()
+            return False
+        finally:
+            os.umask(old_umask)
+        server.listen(8)
+        server.setblocking(False)
+
+        self._server = server
+        self._watch_id = GLib.io_add_watch(server.fileno(), GLib.IO_IN, self._on_accept)
+        print(f"Mintpaper: Control socket listening on {self.path}")
+        return True
+
+    def stop(self):
+        for client in list(self._clients):
+            self._close(client)
+        if self._watch_id is not None:
+            GLib.source_remove(self._watch_id)
+            self._watch_id = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _on_accept(self, fd, condition):
+        try:
+            client, _ = self._server.accept()
+        except OSError:
+            return True
+        client.setblocking(False)
+        watch_id = GLib.io_add_watch(client.fileno(), GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+                                     self._on_client, client)
+        self._clients[client] = (watch_id, bytearray())
+        return True
+
+    def _on_client(self, fd, condition, client):
+        watch_id, buffer = self._clients[client]
+        try:
+            chunk = client.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            chunk = b""
+
+        buffer.extend(chunk)
+        if b"\n" not in buffer and chunk and len(buffer) < 65536:
+            return True
+
+        line = bytes(buffer).split(b"\n", 1)[0].decode("utf-8", "replace").strip()
+        if not line:
+            self._close(client, remove_watch=False)
+            return False
+
+        try:
+            reply = bytearray(self.execute(line).encode())
+            # Sent as the socket takes it, so a slow reader can't stall the GTK loop
+            watch_id = GLib.io_add_watch(client.fileno(), GLib.IO_OUT | GLib.IO_HUP | GLib.IO_ERR,
+                                         self._on_writable, client)
+        except Exception:
+            self._close(client, remove_watch=False)
+            raise
+        self._clients[client] = (watch_id, reply)
+        return False
+
+    def _on_writable(self, fd, condition, client):
+        watch_id, reply = self._clients[client]
+        try:
+            sent = client.send(reply)
+        except BlockingIOError:
+            return True
+        except OSError:
+            sent = len(reply)
+        del reply[:sent]
+        if reply:
+            return True
+        self._close(client, remove_watch=False)
+        return False
+
+    def _close(self, client, remove_watch=True):
+        watch_id, _ = self._clients.pop(client, (None, None))
+        if remove_watch and watch_id is not None:
+            GLib.source_remove(watch_id)
+        client.close()
+
+    # --- Commands ---
+
+    def execute(self, line):
+        self.commands += 1
+        name, _, rest = line.partition(" ")
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return f"error: unknown command {name!r}\n\n" + HELP
+        try:
+            return handler(rest.strip())
+        except (ValueError, LookupError) as e:
+            return f"error: {e}\n"
+        except Exception as e:
+            # Raised by the engine or a plugin while carrying the command out; the
+            # client still gets a reply (and its connection closed) either way
+            print(f"Mintpaper: Control command {line!r} failed ({e!r})")
+            return f"error: {name} failed ({e.__class__.__name__}: {e})\n"
+
+    def cmd_help(self, args):
+        return HELP
+
+    def cmd_metrics(self, args):
+        return self.render_metrics(self.collect())
+
+    def cmd_status(self, args):
+        return json.dumps(self.collect(), indent=4) + "\n"
+
+    def cmd_pause(self, args):
+        return self._set_paused(args, True)
+
+    def cmd_resume(self, args):
+        return self._set_paused(args, False)
+
+    def cmd_reload(self, args):
+        engines = self._engines_for(args)
+        for engine in engines:
+            self.app.recycle_engine(engine, "control socket")
+        return f"ok: reloading {len(engines)} engine(s)\n"
+
+    def cmd_load(self, args):
+        target, _, path = args.partition(" ")
+        path = path.strip()
+        if not path:
+            raise ValueError("usage: load <monitor> <path>")
+        if not os.path.isfile(path):
+            raise ValueError(f"no such file: {path}")
+        if self.app.registry.resolve(path) is None:
+            raise ValueError(f"no plugin handles {path}")
+        engines = self._engines_for(target, allow_all=False)
+        self.app.load_preset_to_monitor(self.app.engines.index(engines[0]), path)
+        return f"ok: loading {path} on monitor {target}\n"
+
+    def _set_paused(self, args, paused):
+        engines = self._engines_for(args)
+        for engine in engines:
+            engine.handle_event(MintpaperEvents.SET_PAUSED, {"should_pause": paused})
+        return f"ok: {'paused' if paused else 'resumed'} {len(engines)} engine(s)\n"
+
+    def _engines_for(self, target, allow_all=True):
+        """Engines drawing on a monitor id ("all" for every engine)."""
+        if not target:
+            raise ValueError("missing monitor id")
+        if target == "all" and allow_all:
+            return list(self.app.engines)
+        try:
+            mid = int(target)
+        except ValueError:
+            raise ValueError(f"bad monitor id {target!r}") from None
+        engines = [e for e in self.app.engines if mid in e.monitor_ids()]
+        if not engines:
+            raise LookupError(f"no engine on monitor {mid}")
+        return engines
+
+    # --- Metrics ---
+
+    def collect(self):
+        app = self.app
+        coverage = {m['id']: m.get('coverage') for m in app.tracker.monitors}
+        input_stats = app.input.get_stats()
+        watchdog = {s['monitor']: s for s in app.watchdog.latest()}
+
+        engines = []
+        for engine in app.engines:
+            plugin = engine.plugin
+            mid = engine.mon.get('id')
+            muted = engine._state_events.get(MintpaperEvents.SET_MUTED, {}).get('should_mute', False)
+            latencies = list(engine.swap_latencies_ms)
+            usage = watchdog.get(mid, {})
+            engines.append({
+                "monitor": mid,
+                "monitor_ids": engine.monitor_ids(),
+                "preset": engine.mon.get('active_preset_path', ''),
+                "plugin": plugin.__class__.__name__ if plugin else None,
+                "loading": engine.pending_plugin is not None,
+                "paused": engine.is_paused,
+                "muted": muted,
+                "asleep": bool(plugin and plugin.is_asleep),
+                "fps": engine.get_fps_limit(),
+                "fps_limit": engine.mon.get('fps_limit'),
+                "fps_cap": engine.fps_cap,
+                "events": dict(engine.event_counts),
+                "coverage": {m: coverage.get(m) for m in engine.monitor_ids()},
+                "input": input_stats.get(mid, {}),
+                "swap_ms_last": round(latencies[-1], 1) if latencies else None,
+                "rss_mb": usage.get('rss_mb'),
+                "cpu_percent": usage.get('cpu_percent'),
+                "sleeps": len(plugin.sleep_reports) if plugin else 0,
+            })
+
+        return {
+            "pid": os.getpid(),
+            "engines": engines,
+            "governor": {"enabled": app.governor.enabled, "level": app.governor.level,
+                         "level_name": app.governor.level_name, "on_battery": app.governor.on_battery},
+            "watchdog_recycles": app.watchdog.recycle_count,
+            "control_commands": self.commands,
+        }
+
+    def render_metrics(self, data):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP mintpaper_{name} {help_text}")
+            lines.append(f"# TYPE mintpaper_{name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                selector = f"{{{label_text}}}" if label_text else ""
+                number = int(value) if isinstance(value, (bool, int)) else round(float(value), 4)
+                lines.append(f"mintpaper_{name}{selector} {number}")
+
+        engines = data["engines"]
+
+        def mon(e):
+            return {"monitor": e["monitor"]}
+
+        metric("engine_info", "gauge", "Loaded preset and plugin per engine (always 1).",
+               [({**mon(e), "preset": e["preset"], "plugin": e["plugin"] or ""}, 1) for e in engines])
+        metric("engine_paused", "gauge", "1 while the engine is paused (tracker or control socket).",
+               [(mon(e), e["paused"]) for e in engines])
+        metric("engine_muted", "gauge", "1 while the tracker has the engine muted.",
+               [(mon(e), e["muted"]) for e in engines])
+        metric("engine_asleep", "gauge", "1 while the engine is in deep sleep.",
+               [(mon(e), e["asleep"]) for e in engines])
+        metric("engine_loading", "gauge", "1 while a new preset is loading behind the current one.",
+               [(mon(e), e["loading"]) for e in engines])
+        metric("engine_fps", "gauge", "Effective frame rate (user limit, manifest and governor applied).",
+               [(mon(e), e["fps"]) for e in engines])
+        metric("engine_fps_limit", "gauge", "The user's fps limit.",
+               [(mon(e), e["fps_limit"]) for e in engines])
+        metric("engine_events_total", "counter", "Events routed to the engine, by type.",
+               [({**mon(e), "type": t}, n) for e in engines for t, n in sorted(e["events"].items())])
+        metric("engine_swap_ms", "gauge", "How long the last preset swap took to show a frame.",
+               [(mon(e), e["swap_ms_last"]) for e in engines])
+        metric("engine_rss_mb", "gauge", "Renderer memory from the watchdog's latest sample.",
+               [(mon(e), e["rss_mb"]) for e in engines])
+        metric("engine_cpu_percent", "gauge", "Renderer CPU from the watchdog's latest sample.",
+               [(mon(e), e["cpu_percent"]) for e in engines])
+        metric("tracker_coverage", "gauge", "Fraction of the monitor covered by windows.",
+               [({"monitor": m, "engine": e["monitor"]}, c) for e in engines for m, c in e["coverage"].items()])
+        metric("input_moves_total", "counter", "Pointer moves by outcome.",
+               [({**mon(e), "outcome": k}, v) for e in engines for k, v in sorted(e["input"].items())])
+
+        governor = data["governor"]
+        metric("governor_level", "gauge", "FPS governor level: 0 normal, 1 busy, 2 saturated.",
+               [({}, governor["level"])] if governor["enabled"] else [])
+        metric("governor_on_battery", "gauge", "1 while running on battery.",
+               [({}, governor["on_battery"])] if governor["enabled"] else [])
+        metric("watchdog_recycles_total", "counter", "Presets reloaded by the watchdog.",
+               [({}, data["watchdog_recycles"])])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+"""
+What the control socket and its client agree on. Kept free of GTK and psutil
+so tools/mintpaperctl.py runs without the engine's dependencies.
+"""
+import os
+
+COMMANDS = ("metrics", "status", "pause", "resume", "reload", "load", "help")
+
+HELP = """Commands (one per connection, newline terminated):
+  metrics                      per-monitor metrics in Prometheus text format
+  status                       the same data as JSON
+  pause <monitor|all>          pause until the tracker next changes that monitor's state
+  resume <monitor|all>
+  reload <monitor|all>         reload the current preset (double-buffered)
+  load <monitor> <path>        swap the monitor to another preset
+  help
+"""
+
+
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "mintpaper.sock")
+    return os.path.join("/tmp", f"mintpaper-{os.getuid()}.sock")
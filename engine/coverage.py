@@ -0,0 +1,168 @@
+"""
+Union-of-rectangles area math for the occlusion tracker.
+
+Two tiled half-screen windows cover a monitor just as well as one maximized
+window, so coverage has to be the area of the *union* of all windows, not the
+biggest single overlap. Rectangles are (x, y, w, h) in root coordinates.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many boxes on one monitor the pure Python sweep beats NumPy's call overhead
+NUMPY_MIN_BOXES = 24
+# Boxes inside another window add nothing to the union; the largest few catch most of them
+PRUNE_PROBES = 16
+
+
+def clip_rect(rect, geo):
+    """Clips an (x, y, w, h) rect to a monitor geometry. Returns (x0, y0, x1, y1) or None."""
+    x, y, w, h = rect
+    x0 = max(x, geo['x'])
+    y0 = max(y, geo['y'])
+    x1 = min(x + w, geo['x'] + geo['w'])
+    y1 = min(y + h, geo['y'] + geo['h'])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1, y1)
+
+
+def union_area(rects, geo):
+    """Returns the area of the union of rects, restricted to the monitor geometry."""
+    return coverage_by_monitor({0: rects}, [{"id": 0, "geometry": geo}])[0] * geo['w'] * geo['h']
+
+
+def coverage_by_monitor(rects_by_monitor, monitors):
+    """
+    Returns {monitor_id: covered fraction} where each monitor's fraction is the
+    area of the union of its rects. Monitors are expected not to overlap.
+    """
+    result = {}
+    for m in monitors:
+        geo = m['geometry']
+        rects = rects_by_monitor.get(m['id'], ())
+        if np is not None and len(rects) >= NUMPY_MIN_BOXES:
+            covered = _numpy_covered_area(rects, geo)
+        else:
+            covered = _python_covered_area(rects, geo)
+        result[m['id']] = covered / (geo['w'] * geo['h'])
+    return result
+
+
+def _python_covered_area(rects, geo):
+    full = (geo['x'], geo['y'], geo['x'] + geo['w'], geo['y'] + geo['h'])
+    boxes = set()
+    for rect in rects:
+        box = clip_rect(rect, geo)
+        if box is not None:
+            boxes.add(box)
+
+    # A single window covering the whole monitor short-circuits everything
+    if full in boxes:
+        return geo['w'] * geo['h']
+    if len(boxes) <= 1:
+        return sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+    return _sweep_union_area(list(boxes))
+
+
+def _numpy_covered_area(rects, geo):
+    arr = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+    boxes = np.empty_like(arr)
+    boxes[:, 0] = np.maximum(arr[:, 0], geo['x'])
+    boxes[:, 1] = np.maximum(arr[:, 1], geo['y'])
+    boxes[:, 2] = np.minimum(arr[:, 0] + arr[:, 2], geo['x'] + geo['w'])
+    boxes[:, 3] = np.minimum(arr[:, 1] + arr[:, 3], geo['y'] + geo['h'])
+    boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+
+    full = (geo['x'], geo['y'], geo['x'] + geo['w'], geo['y'] + geo['h'])
+    if len(boxes) == 0:
+        return 0
+    if (boxes == full).all(axis=1).any():
+        return geo['w'] * geo['h']
+    return _grid_union_area(_drop_contained(boxes))
+
+
+def _sweep_union_area(boxes):
+    """Classic sweep line over x with a segment tree over compressed y. O(n log n)."""
+    ys = sorted({y for box in boxes for y in (box[1], box[3])})
+    y_index = {y: i for i, y in enumerate(ys)}
+
+    events = []
+    for x0, y0, x1, y1 in boxes:
+        events.append((x0, 1, y_index[y0], y_index[y1]))
+        events.append((x1, -1, y_index[y0], y_index[y1]))
+    events.sort()
+
+    segments = len(ys) - 1
+    count = [0] * (4 * segments)
+    covered = [0] * (4 * segments)
+
+    def update(node, lo, hi, a, b, delta):
+        if b <= lo or hi <= a:
+            return
+        if a <= lo and hi <= b:
+            count[node] += delta
+        else:
+            mid = (lo + hi) // 2
+            update(2 * node, lo, mid, a, b, delta)
+            update(2 * node + 1, mid, hi, a, b, delta)
+
+        if count[node]:
+            covered[node] = ys[hi] - ys[lo]
+        elif hi - lo == 1:
+            covered[node] = 0
+        else:
+            covered[node] = covered[2 * node] + covered[2 * node + 1]
+
+    area = 0
+    prev_x = events[0][0]
+    for x, delta, a, b in events:
+        area += covered[1] * (x - prev_x)
+        prev_x = x
+        update(1, 0, segments, a, b, delta)
+    return area
+
+
+def _inside(a, b):
+    """inside[i, j]: box a[i] lies within box b[j]."""
+    return ((a[:, None, 0] >= b[None, :, 0]) & (a[:, None, 1] >= b[None, :, 1]) &
+            (a[:, None, 2] <= b[None, :, 2]) & (a[:, None, 3] <= b[None, :, 3]))
+
+
+def _drop_contained(arr):
+    """
+    Removes boxes that lie inside another box (of identical boxes, the first is
+    kept). The largest boxes are checked first against everything, then the
+    survivors against each other, so the full pairwise check only runs on a few.
+    """
+    areas = (arr[:, 2] - arr[:, 0]) * (arr[:, 3] - arr[:, 1])
+    arr = arr[np.argsort(-areas, kind='stable')]
+    if len(arr) > PRUNE_PROBES:
+        probes, rest = arr[:PRUNE_PROBES], arr[PRUNE_PROBES:]
+        arr = np.concatenate((probes, rest[~_inside(rest, probes).any(axis=1)]))
+    inside = _inside(arr, arr)
+    # Inside an earlier box (which covers duplicates), or strictly inside a later one
+    inside &= np.tri(len(arr), k=-1, dtype=bool) | ~inside.T
+    return arr[~inside.any(axis=1)]
+
+
+def _grid_union_area(arr):
+    """
+    Vectorized union area: box edges are compressed onto a grid, each box adds
+    +1/-1 at its corners, and two cumulative sums give how many boxes cover
+    each cell. O(n log n + cells) instead of the sweep's Python-level tree.
+    """
+    xs, xi = np.unique(arr[:, [0, 2]], return_inverse=True)
+    ys, yi = np.unique(arr[:, [1, 3]], return_inverse=True)
+    xi = xi.reshape(-1, 2)
+    yi = yi.reshape(-1, 2)
+
+    diff = np.zeros((len(xs), len(ys)), dtype=np.int32)
+    np.add.at(diff, (xi[:, 0], yi[:, 0]), 1)
+    np.add.at(diff, (xi[:, 1], yi[:, 0]), -1)
+    np.add.at(diff, (xi[:, 0], yi[:, 1]), -1)
+    np.add.at(diff, (xi[:, 1], yi[:, 1]), 1)
+    covered = diff.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] > 0
+    return int(np.diff(xs) @ covered @ np.diff(ys))
@@ -50,50 +50,113 @@ def get_monitor_data():
     
     return monitors
 
-def sync_config(config_path="config.json"):
+def merge_monitors(config, hardware, detached=None):
     """
-    Updates the config.json file by comparing current hardware 
-    against saved settings.
+    Matches the detected hardware against the saved monitor entries by name,
+    keeping user settings and the entry dicts themselves (engines hold
+    references to them). Entries for monitors that are gone are moved into
+    `detached` (name -> entry) when given, so a re-plugged screen gets its
+    settings back. Returns (added, removed, moved) lists of entries.
     """
-    current_hardware = get_monitor_data()
-    
-    # Ensure the config file exists
-    if not os.path.exists(config_path):
-        default_config = {
-            "engine_version": "1.0.0",
-            "monitors": current_hardware
-        }
-        with open(config_path, 'w') as f:
-            json.dump(default_config, f, indent=4)
-        return default_config
-
-    # Load existing config
-    with open(config_path, 'r') as f:
-        try:
-            config = json.load(f)
-        except json.JSONDecodeError:
-            config = {"engine_version": "1.0.0", "monitors": []}
-
-    # MERGE LOGIC: Update existing monitor geometries but keep user settings
-    # For a public engine, we match by Monitor ID or Name
-    updated_monitors = []
-    for hardware in current_hardware:
+    previous = {id(m): m for m in config.get("monitors", [])}
+    pool = list(config.get("monitors", []))
+    if detached:
+        pool.extend(detached.values())
+
+    updated_monitors, added, moved = [], [], []
+    for hardware_mon in hardware:
         # Check if we already have settings for this monitor
-        existing = next((m for m in config["monitors"] if m["name"] == hardware["name"]), None)
-        
+        existing = next((m for m in pool if m.get("name") == hardware_mon["name"]), None)
+
         if existing:
-            # Update physical data (geometry changes)
-            existing["geometry"] = hardware["geometry"]
-            existing["isPrimary"] = hardware["isPrimary"]
-            existing["orientation"] = hardware["orientation"]
+            if detached:
+                detached.pop(existing.get("name"), None)
+            if id(existing) not in previous:
+                added.append(existing)
+            elif existing.get("geometry") != hardware_mon["geometry"]:
+                moved.append(existing)
+            # Update physical data (index and geometry can change when screens come and go)
+            existing["id"] = hardware_mon["id"]
+            existing["geometry"] = hardware_mon["geometry"]
+            existing["isPrimary"] = hardware_mon["isPrimary"]
+            existing["orientation"] = hardware_mon["orientation"]
+            existing["scale_factor"] = hardware_mon["scale_factor"]
+            pool.remove(existing)
             updated_monitors.append(existing)
         else:
             # New monitor found! get_monitor_data already populated the defaults.
-            updated_monitors.append(hardware)
+            added.append(hardware_mon)
+            updated_monitors.append(hardware_mon)
+
+    kept = {id(m) for m in updated_monitors}
+    removed = [m for m in previous.values() if id(m) not in kept]
+    if detached is not None:
+        for m in removed:
+            detached[m.get("name")] = m
 
     config["monitors"] = updated_monitors
-    
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=4)
+    return added, removed, moved
+
+
+def sync_config(store):
+    """
+    Merges the current hardware into the config store's model, keeping user
+    settings. config.json is only written when something actually changed.
+    """
+    config = store.load()
+    before = json.dumps(config, sort_keys=True)
+    config.setdefault("tracker_mode", "event")
+
+    merge_monitors(config, get_monitor_data())
+
+    if json.dumps(config, sort_keys=True) != before or not os.path.exists(store.path):
+        store.save_now()
         
-    return config
\ No newline at end of file
+    return config
+
+
+def build_span_monitor(config):
+    """
+    Turns the optional "spanning" config section into a single pseudo-monitor
+    covering the bounding box of the selected monitors. Returns None when
+    spanning is disabled or fewer than two monitors are selected.
+
+    The section is updated in place (like the monitors list) so preset changes
+    made on the spanning engine persist to config.json.
+    """
+    span = config.get("spanning")
+    if not span or not span.get("enabled"):
+        return None
+
+    wanted = span.get("monitors") or [m["id"] for m in config.get("monitors", [])]
+    members = [m for m in config.get("monitors", []) if m["id"] in wanted]
+    if len(members) < 2:
+        print("Mintpaper: Spanning needs at least two connected monitors. Ignoring.")
+        return None
+
+    left = min(m["geometry"]["x"] for m in members)
+    top = min(m["geometry"]["y"] for m in members)
+    right = max(m["geometry"]["x"] + m["geometry"]["w"] for m in members)
+    bottom = max(m["geometry"]["y"] + m["geometry"]["h"] for m in members)
+
+    span["id"] = "span"
+    span["name"] = "Spanning " + " + ".join(m["name"] for m in members)
+    span["monitor_ids"] = [m["id"] for m in members]
+    span["geometry"] = {"x": left, "y": top, "w": right - left, "h": bottom - top}
+    # Rects relative to the spanning window, so presets can skip the gaps between screens
+    span["monitor_rects"] = [
+        {
+            "id": m["id"],
+            "x": m["geometry"]["x"] - left,
+            "y": m["geometry"]["y"] - top,
+            "w": m["geometry"]["w"],
+            "h": m["geometry"]["h"],
+        }
+        for m in members
+    ]
+    span.setdefault("active_preset_path", members[0].get("active_preset_path", ""))
+    span.setdefault("is_muted", True)
+    span.setdefault("volume", 50)
+    span.setdefault("fps_limit", 60)
+    span.setdefault("performance_mode", True)
+    return span
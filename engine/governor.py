@@ -0,0 +1,140 @@
+import time
+from collections import deque
+
+# Load levels, from least to most constrained
+LEVELS = ("normal", "busy", "saturated")
+
+DEFAULT_OPTIONS = {
+    # Off by default: while on, it keeps the stats sampler running for every preset
+    "enabled": False,
+    "cpu_busy": 80.0,          # percent; entering "busy"
+    "cpu_saturated": 95.0,     # percent; entering "saturated"
+    "hysteresis": 15.0,        # a level is left only once CPU drops this far below its threshold
+    "samples_to_throttle": 2,  # consecutive samples before stepping up a level
+    "samples_to_restore": 3,   # consecutive samples before stepping back down
+    # fps caps per policy; None leaves the user's fps_limit alone.
+    # A monitor with performance_mode on uses "performance", otherwise "quality".
+    "policies": {
+        "performance": {"battery": 30, "busy": 30, "saturated": 15},
+        "quality": {"battery": None, "busy": None, "saturated": 30},
+    },
+}
+
+
+class MintpaperFpsGovernor:
+    """
+    Lowers each engine's effective fps while the CPU is under load or the
+    laptop runs on battery, and restores it afterwards. Feeds on the stats
+    sampler's samples; every change is recorded in `decisions`.
+    """
+
+    def __init__(self, engines, options=None, history_size=100):
+        self.engines = engines
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        # Each policy is merged key by key, so {"quality": {"battery": 30}} keeps the other caps
+        user_policies = self.options.get("policies") or {}
+        self.policies = {
+            name: {**DEFAULT_OPTIONS["policies"].get(name, {}), **(user_policies.get(name) or {})}
+            for name in {**DEFAULT_OPTIONS["policies"], **user_policies}
+        }
+
+        self.level = 0
+        self.on_battery = False
+        self._streak = 0           # consecutive samples asking for the same move
+        self._streak_direction = 0
+        self.decisions = deque(maxlen=history_size)
+
+    @property
+    def level_name(self):
+        return LEVELS[self.level]
+
+    @property
+    def enabled(self):
+        return bool(self.options.get("enabled"))
+
+    def needs_samples(self):
+        """True if some engine's policy can actually throttle it, so the stats sampler must run."""
+        if not self.enabled:
+            return False
+        return any(
+            any(cap for cap in self._policy_for(engine).values())
+            for engine in self.engines
+        )
+
+    def _policy_for(self, engine):
+        return self.policies["performance" if engine.mon.get('performance_mode', False) else "quality"]
+
+    # --- Sample handling (GTK main thread) ---
+
+    def on_sample(self, sample):
+        if not self.enabled:
+            return
+        battery = sample.get("battery")
+        self.on_battery = bool(battery) and not battery["plugged"]
+        self._update_level(sample["cpu"])
+        self.apply(sample)
+
+    def _update_level(self, cpu):
+        thresholds = (None, self.options["cpu_busy"], self.options["cpu_saturated"])
+
+        direction = 0
+        if self.level + 1 < len(LEVELS) and cpu >= thresholds[self.level + 1]:
+            direction = 1
+        elif self.level > 0 and cpu < thresholds[self.level] - self.options["hysteresis"]:
+            direction = -1
+
+        if direction == 0 or direction != self._streak_direction:
+            self._streak = 0
+        self._streak_direction = direction
+        if direction == 0:
+            return
+
+        self._streak += 1
+        needed = self.options["samples_to_throttle"] if direction > 0 else self.options["samples_to_restore"]
+        if self._streak >= needed:
+            self.level += direction
+            self._streak = 0
+
+    def cap_for(self, engine):
+        """The fps cap (and why) this engine should run at right now, or (None, None)."""
+        policy = self._policy_for(engine)
+        candidates = []
+        if self.on_battery and policy.get("battery"):
+            candidates.append((policy["battery"], "on battery"))
+        if self.level > 0 and policy.get(LEVELS[self.level]):
+            candidates.append((policy[LEVELS[self.level]], f"CPU {LEVELS[self.level]}"))
+        if not candidates:
+            return None, None
+        return min(candidates)
+
+    def apply(self, sample=None):
+        for engine in self.engines:
+            cap, reason = self.cap_for(engine)
+            if cap == engine.fps_cap:
+                continue
+
+            before = engine.get_fps_limit()
+            engine.set_fps_cap(cap)
+            after = engine.get_fps_limit()
+
+            decision = {
+                "time": time.time(),
+                "monitor": engine.mon.get('id'),
+                "cap": cap,
+                "fps_from": before,
+                "fps_to": after,
+                "reason": reason or "load back to normal",
+                "level": LEVELS[self.level],
+                "on_battery": self.on_battery,
+                "cpu": sample["cpu"] if sample else None,
+            }
+            self.decisions.append(decision)
+            print(f"Mintpaper: Governor monitor {decision['monitor']}: {before} -> {after} fps ({decision['reason']})")
+
+    def get_decisions(self, seconds=None):
+        """Recent throttle/restore decisions, oldest first."""
+        if seconds is None:
+            return list(self.decisions)
+        cutoff = time.time() - seconds
+        return [d for d in self.decisions if d["time"] >= cutoff]
@@ -0,0 +1,145 @@
+import threading
+import time
+from gi.repository import GLib
+
+from engine.tracing import tracer
+
+
+class MintpaperInputCoalescer:
+    """
+    Sits between the pynput thread and the engines. Motion events only overwrite
+    the latest pointer position; each engine then receives at most one MOUSE_MOVE
+    per frame at its own fps_limit. Timers stop as soon as the pointer is idle.
+    """
+
+    def __init__(self, engines):
+        self.engines = engines
+
+        # Written by the pynput thread, read on the GTK main thread
+        self._lock = threading.Lock()
+        self._latest = None
+        self._latest_at = None   # when pynput saw it (only while tracing)
+        self._seq = 0
+        self._wake_pending = False
+
+        # Main thread only
+        self._timers = {}      # engine -> (GLib source id, interval ms)
+        self._last_seq = {}    # engine -> last sequence number it has seen
+        self.stats = {}        # monitor id -> counters
+
+    # --- Producer side (pynput thread) ---
+
+    def push_move(self, x, y):
+        with self._lock:
+            self._latest = (x, y)
+            if tracer.enabled:
+                self._latest_at = time.monotonic()
+            self._seq += 1
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        # Only the first event after an idle period touches the main loop; the flag
+        # stays set until the frame timers go quiet again
+        GLib.idle_add(self._wake)
+
+    # --- Consumer side (GTK main thread) ---
+
+    def _wake(self):
+        self._start_idle_engines()
+        return False
+
+    def _start_idle_engines(self):
+        for engine in self.engines:
+            if engine not in self._timers:
+                self._flush(engine)
+                self._start_timer(engine)
+
+    def _start_timer(self, engine):
+        interval = max(1, int(1000 / max(1, engine.get_fps_limit())))
+        source_id = GLib.timeout_add(interval, self._on_frame, engine)
+        self._timers[engine] = (source_id, interval)
+
+    def _on_frame(self, engine):
+        if engine not in self.engines:
+            self._last_seq.pop(engine, None)
+            self._stop_timer(engine)
+            return False
+
+        if not self._flush(engine):
+            # Nothing new since last frame: go quiet until the next motion event
+            self._stop_timer(engine)
+            return False
+        # Engines that went quiet while this one kept running missed the wake-up
+        if len(self._timers) < len(self.engines):
+            self._start_idle_engines()
+
+        # Follow live fps_limit changes without waiting for the pointer to stop
+        interval = max(1, int(1000 / max(1, engine.get_fps_limit())))
+        if interval != self._timers[engine][1]:
+            self._start_timer(engine)
+            return False
+        return True
+
+    def _stop_timer(self, engine):
+        self._timers.pop(engine, None)
+        if self._timers:
+            return
+        with self._lock:
+            # A move that came in after the last flush found the flag still set and didn't wake us
+            self._wake_pending = self._seq != self._last_seq.get(engine, self._seq)
+            wake = self._wake_pending
+        if wake:
+            GLib.idle_add(self._wake)
+
+    def _flush(self, engine):
+        """Sends the newest position to one engine. Returns False if there was nothing new."""
+        with self._lock:
+            latest, seq, latest_at = self._latest, self._seq, self._latest_at
+
+        last = self._last_seq.get(engine, 0)
+        if latest is None or seq == last:
+            return False
+        self._last_seq[engine] = seq
+
+        stats = self._stats_for(engine)
+        stats["received"] += seq - last
+
+        if engine.is_paused or not engine.wants_event("MOUSE_MOVE"):
+            stats["skipped"] += seq - last
+            return True
+
+        # Everything between the last flush and this one was overwritten
+        stats["dropped"] += seq - last - 1
+        stats["delivered"] += 1
+
+        # Translate global OS coordinates into local monitor coordinates
+        geo = engine.mon.get('geometry')
+        x, y = latest
+        data = {"local_x": x - geo['x'], "local_y": y - geo['y']}
+        if tracer.enabled:
+            data["trace_id"] = tracer.begin("mouse", engine.mon.get('id'), at=latest_at)
+            tracer.stamp(data["trace_id"], "main_loop")
+        engine.handle_event("MOUSE_MOVE", data)
+        return True
+
+    def _stats_for(self, engine):
+        mid = engine.mon.get('id')
+        if mid not in self.stats:
+            self.stats[mid] = {"received": 0, "delivered": 0, "dropped": 0, "skipped": 0}
+        return self.stats[mid]
+
+    def get_stats(self):
+        """Per-monitor counters: received, delivered, dropped (coalesced away), skipped (paused/unused)."""
+        return {mid: dict(counters) for mid, counters in self.stats.items()}
+
+    def report(self):
+        for mid, s in sorted(self.stats.items(), key=lambda item: str(item[0])):
+            print(f"Mintpaper: Input monitor {mid}: {s['received']} moves, {s['delivered']} delivered, "
+                  f"{s['dropped']} coalesced, {s['skipped']} skipped")
+
+    def stop(self):
+        for source_id, _ in self._timers.values():
+            GLib.source_remove(source_id)
+        self._timers.clear()
+        with self._lock:
+            self._wake_pending = False
@@ -0,0 +1,80 @@
+import json
+import os
+
+# Input events a preset can opt into, keyed by their manifest names
+INPUT_EVENTS = {
+    "mouse": "MOUSE_MOVE",
+    "click": "MOUSE_CLICK",
+    "stats": "SYS_STATS",
+}
+
+
+class PresetManifest:
+    """
+    Optional per-preset declarations read from manifest.json next to the preset file:
+
+        {
+            "inputs": ["mouse", "click", "stats"],
+            "fps": {"preferred": 30, "max": 60},
+            "native_pause": false
+        }
+
+    Presets without a manifest get every input and no fps constraints.
+    """
+
+    def __init__(self, inputs=None, preferred_fps=None, max_fps=None, native_pause=False, path=None):
+        self.inputs = set(INPUT_EVENTS) if inputs is None else set(inputs)
+        self.preferred_fps = preferred_fps
+        self.max_fps = max_fps
+        self.native_pause = native_pause
+        self.path = path
+
+    @property
+    def events(self):
+        return {INPUT_EVENTS[name] for name in self.inputs if name in INPUT_EVENTS}
+
+    def accepts(self, event_type):
+        """Control events (pause, mute, fps...) always pass; input events need a declaration."""
+        if event_type not in INPUT_EVENTS.values():
+            return True
+        return event_type in self.events
+
+    def clamp_fps(self, fps, performance_mode=False):
+        """Caps the user's fps_limit at the preset's max, and at its preferred rate in performance mode."""
+        if self.max_fps:
+            fps = min(fps, self.max_fps)
+        if performance_mode and self.preferred_fps:
+            fps = min(fps, self.preferred_fps)
+        return fps
+
+
+def load_manifest(preset_path):
+    """Reads manifest.json from the preset's folder, falling back to today's behaviour."""
+    if not preset_path:
+        return PresetManifest()
+
+    manifest_path = os.path.join(os.path.dirname(os.path.abspath(preset_path)), "manifest.json")
+    if not os.path.isfile(manifest_path):
+        return PresetManifest()
+
+    try:
+        with open(manifest_path, 'r') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Mintpaper: Ignoring unreadable manifest {manifest_path} ({e})")
+        return PresetManifest()
+
+    inputs = data.get("inputs")
+    if inputs is not None:
+        unknown = set(inputs) - set(INPUT_EVENTS)
+        if unknown:
+            print(f"Mintpaper: Manifest {manifest_path} declares unknown inputs: {sorted(unknown)}")
+
+    fps = data.get("fps", {})
+    return PresetManifest(
+        inputs=inputs,
+        preferred_fps=fps.get("preferred"),
+        max_fps=fps.get("max"),
+        native_pause=bool(data.get("native_pause", False)),
+        path=manifest_path
+    )
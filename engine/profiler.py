@@ -0,0 +1,118 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import psutil
+
+ENV_VAR = "MINTPAPER_PROFILE_STARTUP"
+DEFAULT_REPORT_PATH = "startup_profile.json"
+
+
+class StartupProfiler:
+    """
+    Opt-in startup timeline. Enabled with --profile-startup[=PATH] or the
+    MINTPAPER_PROFILE_STARTUP environment variable ("1" for the default path).
+    All times are milliseconds since the Python process was created, so the
+    interpreter and import cost before main.py ran is included.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_path = None
+        self.metadata = {}
+
+        self._origin = time.monotonic()
+        try:
+            self._origin -= time.time() - psutil.Process().create_time()
+        except psutil.Error:
+            pass
+
+        self.phases = []
+        self.marks = []
+        self.first_frames = {}
+        self._expected = set()
+        self._expecting = False
+        self._written = False
+
+    def enable(self, output_path=None):
+        self.enabled = True
+        self.output_path = output_path or DEFAULT_REPORT_PATH
+
+    def enable_from_env(self):
+        value = os.environ.get(ENV_VAR)
+        if value and value != "0":
+            self.enable(None if value == "1" else value)
+
+    def now_ms(self):
+        return round((time.monotonic() - self._origin) * 1000, 2)
+
+    @contextmanager
+    def phase(self, name, **meta):
+        if not self.enabled:
+            yield
+            return
+        start = self.now_ms()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                "name": name,
+                "start_ms": start,
+                "duration_ms": round(self.now_ms() - start, 2),
+                **meta
+            })
+
+    def mark(self, name, **meta):
+        if self.enabled:
+            self.marks.append({"name": name, "at_ms": self.now_ms(), **meta})
+
+    def expect_first_frames(self, monitor_ids, timeout_s=30):
+        """The report is written once every listed monitor has shown a frame (or on timeout)."""
+        if not self.enabled:
+            return
+        from gi.repository import GLib
+        self._expecting = True
+        self._expected = set(monitor_ids) - set(self.first_frames)
+        if not self._expected:
+            self.write_report()
+        else:
+            GLib.timeout_add_seconds(timeout_s, self._on_timeout)
+
+    def first_frame(self, monitor_id, plugin_name=None):
+        if not self.enabled or monitor_id in self.first_frames:
+            return
+        self.first_frames[monitor_id] = {"at_ms": self.now_ms(), "plugin": plugin_name}
+        self._expected.discard(monitor_id)
+        if self._expecting and not self._expected:
+            self.write_report()
+
+    def _on_timeout(self):
+        if not self._written:
+            self.mark("first_frame_timeout", missing=sorted(map(str, self._expected)))
+            self.write_report()
+        return False
+
+    def report(self):
+        frame_times = [f["at_ms"] for f in self.first_frames.values()]
+        return {
+            **self.metadata,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "time_to_first_wallpaper_ms": min(frame_times) if frame_times else None,
+            "time_to_all_wallpapers_ms": max(frame_times) if frame_times and not self._expected else None,
+            "first_frames": {str(k): v for k, v in self.first_frames.items()},
+            "phases": self.phases,
+            "marks": self.marks,
+        }
+
+    def write_report(self):
+        if not self.enabled or self._written:
+            return
+        self._written = True
+        with open(self.output_path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+        print(f"Mintpaper: Startup profile written to {self.output_path}")
+
+
+# One timeline per process
+profiler = StartupProfiler()
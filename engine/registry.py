@@ -0,0 +1,89 @@
+import importlib
+import mimetypes
+import os
+from importlib import metadata
+
+# Third-party packages register plugins under this group. The entry point name
+# is the file extension it handles, and the value is the plugin class:
+#     [project.entry-points."mintpaper.plugins"]
+#     gif = "mintpaper_gif:GifPlugin"
+ENTRY_POINT_GROUP = "mintpaper.plugins"
+
+
+class PluginRegistry:
+    """
+    Maps file extensions and MIME types to plugin classes, importing a plugin's
+    module only the first time a monitor actually needs it. A machine running
+    only videos never pays for WebKit.
+    """
+
+    def __init__(self):
+        self._by_extension = {}   # "html" -> target
+        self._by_mime = {}        # "text/html" -> target
+        self._loaded = {}         # target -> plugin class
+
+    def register(self, target, extensions=(), mime_types=()):
+        """
+        target is either a plugin class or a lazy "module:ClassName" string
+        (or an importlib.metadata.EntryPoint).
+        """
+        for ext in extensions:
+            self._by_extension[ext.lower().lstrip('.')] = target
+        for mime in mime_types:
+            self._by_mime[mime] = target
+
+    def load_entry_points(self):
+        """Registers installed third-party plugins without importing them."""
+        try:
+            entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10
+            entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+
+        for ep in entry_points:
+            self.register(ep, extensions=[ep.name])
+
+    def resolve(self, file_path):
+        """Returns the plugin class for a file, importing it on first use, or None."""
+        ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+        target = self._by_extension.get(ext)
+
+        if target is None:
+            mime, _ = mimetypes.guess_type(file_path)
+            if mime:
+                target = self._by_mime.get(mime) or self._by_mime.get(mime.split('/')[0] + '/*')
+        if target is None:
+            return None
+
+        return self._load(target)
+
+    def _load(self, target):
+        if isinstance(target, type):
+            return target
+        if target in self._loaded:
+            return self._loaded[target]
+
+        try:
+            if isinstance(target, str):
+                module_name, class_name = target.split(':')
+                plugin_class = getattr(importlib.import_module(module_name), class_name)
+            else:
+                plugin_class = target.load()
+        except Exception as e:
+            print(f"Mintpaper: Failed to import plugin {target} ({e})")
+            return None
+
+        self._loaded[target] = plugin_class
+        return plugin_class
+
+    def loaded_plugins(self):
+        return [cls.__name__ for cls in self._loaded.values()]
+
+
+def default_registry():
+    """The built-in plugins plus anything installed through entry points."""
+    registry = PluginRegistry()
+    registry.register("plugins.webview:WebviewPlugin", extensions=("html", "htm"), mime_types=("text/html",))
+    registry.register("plugins.mp4:Mp4Plugin", extensions=("mp4", "webm", "mkv"), mime_types=("video/*",))
+    registry.load_entry_points()
+    return registry
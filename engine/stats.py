@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from collections import deque
+
+import psutil
+from gi.repository import GLib
+
+from engine.tracing import tracer
+
+# How far a metric has to move before presets hear about it again
+DEFAULT_DELTAS = {
+    "cpu": 1.0,         # percent
+    "cpu_per_core": 5.0,  # percent, any single core
+    "ram": 0.5,         # percent
+    "disk": 0.5,        # percent
+    "net": 16.0,        # KiB/s, either direction
+    "temps": 1.0,       # degrees C, any sensor
+}
+
+
+class MintpaperStatsSampler:
+    """
+    Samples system stats on a background thread so psutil never blocks the GTK
+    loop. Every sample lands in a fixed-size history ring buffer; engines only
+    receive SYS_STATS when a metric moved past its configured delta.
+    """
+
+    def __init__(self, engines, interval=2.0, history_size=150, deltas=None, disk_path="/"):
+        self.engines = engines
+        self.interval = interval
+        self.disk_path = disk_path
+        self.deltas = dict(DEFAULT_DELTAS)
+        self.deltas.update(deltas or {})
+
+        self._lock = threading.Lock()
+        self.history = deque(maxlen=history_size)
+        self._last_pushed = None
+        self._last_net = None
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Main-thread callbacks that see every sample, not just the ones that moved
+        self.listeners = []
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stop_event.is_set()
+
+    def start(self):
+        if self.running:
+            return
+        # A fresh event per run so a thread that is still winding down can't be revived
+        self._stop_event = threading.Event()
+        self._last_pushed = None
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                        name="mintpaper-stats", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread = None
+
+    # --- Sampling thread ---
+
+    def _run(self, stop_event):
+        # Prime the CPU counters; the first real reading comes one interval later
+        psutil.cpu_percent(interval=None, percpu=True)
+        psutil.cpu_percent(interval=None)
+        self._last_net = (time.monotonic(), psutil.net_io_counters())
+
+        while not stop_event.wait(self.interval):
+            try:
+                sample = self._sample()
+            except Exception as e:
+                print(f"Mintpaper: Stats sample failed ({e})")
+                continue
+
+            with self._lock:
+                self.history.append(sample)
+                changed = self._has_changed(sample)
+                if changed:
+                    self._last_pushed = sample
+
+            if changed:
+                GLib.idle_add(self._push, sample, time.monotonic())
+            if self.listeners:
+                GLib.idle_add(self._notify_listeners, sample)
+
+    def _sample(self):
+        now = time.monotonic()
+        net = psutil.net_io_counters()
+        last_time, last_net = self._last_net
+        elapsed = max(now - last_time, 1e-6)
+        self._last_net = (now, net)
+
+        return {
+            "time": time.time(),
+            "cpu": psutil.cpu_percent(interval=None),
+            "cpu_per_core": psutil.cpu_percent(interval=None, percpu=True),
+            "ram": psutil.virtual_memory().percent,
+            "disk": psutil.disk_usage(self.disk_path).percent,
+            "net": {
+                "sent_kbps": round((net.bytes_sent - last_net.bytes_sent) / 1024 / elapsed, 1),
+                "recv_kbps": round((net.bytes_recv - last_net.bytes_recv) / 1024 / elapsed, 1),
+            },
+            "temps": self._read_temperatures(),
+            "battery": self._read_battery(),
+        }
+
+    def _read_temperatures(self):
+        """Hottest reading per sensor chip, or {} where the platform has none."""
+        if not hasattr(psutil, "sensors_temperatures"):
+            return {}
+        try:
+            sensors = psutil.sensors_temperatures()
+        except Exception:
+            return {}
+        return {
+            chip: max(entry.current for entry in entries)
+            for chip, entries in sensors.items() if entries
+        }
+
+    def _read_battery(self):
+        """{"percent", "plugged"} on laptops, None on desktops."""
+        try:
+            battery = psutil.sensors_battery()
+        except Exception:
+            return None
+        if battery is None:
+            return None
+        return {"percent": round(battery.percent, 1), "plugged": battery.power_plugged}
+
+    def _has_changed(self, sample):
+        last = self._last_pushed
+        if last is None:
+            return True
+
+        if abs(sample["cpu"] - last["cpu"]) >= self.deltas["cpu"]:
+            return True
+        if abs(sample["ram"] - last["ram"]) >= self.deltas["ram"]:
+            return True
+        if abs(sample["disk"] - last["disk"]) >= self.deltas["disk"]:
+            return True
+        if len(sample["cpu_per_core"]) != len(last["cpu_per_core"]) or any(
+            abs(a - b) >= self.deltas["cpu_per_core"]
+            for a, b in zip(sample["cpu_per_core"], last["cpu_per_core"])
+        ):
+            return True
+        if any(abs(sample["net"][k] - last["net"][k]) >= self.deltas["net"] for k in sample["net"]):
+            return True
+        if sample["temps"].keys() != last["temps"].keys() or any(
+            abs(sample["temps"][chip] - last["temps"][chip]) >= self.deltas["temps"]
+            for chip in sample["temps"]
+        ):
+            return True
+        if sample["battery"] != last["battery"]:
+            return True
+        return False
+
+    # --- GTK main thread ---
+
+    def _push(self, sample, sampled_at=None):
+        # Time spent waiting for the GTK loop, then the fan-out itself
+        tracer.complete("stats.queue", "stats", sampled_at or time.monotonic(), timeline="Stats")
+        with tracer.span("stats.push", "stats", "Stats"):
+            for engine in self.engines:
+                if engine.wants_event("SYS_STATS"):
+                    engine.handle_event("SYS_STATS", sample)
+        return False
+
+    def _notify_listeners(self, sample):
+        for callback in list(self.listeners):
+            callback(sample)
+        return False
+
+    def latest(self):
+        with self._lock:
+            return self.history[-1] if self.history else None
+
+    def get_history(self, seconds=None):
+        """Returns samples from the last `seconds` (all of them if None or invalid), oldest first."""
+        with self._lock:
+            samples = list(self.history)
+        # Pages send this, so it can be anything
+        try:
+            seconds = float(seconds)
+        except (TypeError, ValueError):
+            return samples
+        if not math.isfinite(seconds):
+            return samples
+        cutoff = time.time() - seconds
+        return [s for s in samples if s["time"] >= cutoff]
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+ENV_VAR = "MINTPAPER_TRACE"
+DEFAULT_TRACE_PATH = "mintpaper_trace.json"
+
+# Where an input event can be stamped on its way to the page, in order:
+#   pynput          the listener thread got it from X
+#   main_loop       the GTK loop picked it up (after idle_add / the coalescer's frame timer)
+#   dispatch        the plugin queued it for the page
+#   run_javascript  the batch holding it went to run_javascript
+#   page            the page's updateMouse/updateClick returned
+#   frame           the next animation frame ran, i.e. the page could show it
+STAGES = ("pynput", "main_loop", "dispatch", "run_javascript", "page", "frame")
+
+# Histogram bucket upper bounds in ms; the last bucket is open-ended
+BUCKETS_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+# Traces the page never answered (paused, reloading, no bridge) are given up after this
+EXPIRE_S = 2.0
+
+
+class LatencyHistogram:
+    """Log-spaced latency buckets; percentiles are the upper bound of the bucket they fall in."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        index = next((i for i, bound in enumerate(BUCKETS_MS) if ms <= bound), len(BUCKETS_MS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        target = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else round(self.max, 2)
+        return round(self.max, 2)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip([f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.counts)),
+        }
+
+
+class MintpaperTracer:
+    """
+    Opt-in tracing of the engine's pipelines. Enabled with --trace[=PATH] or
+    the MINTPAPER_TRACE environment variable ("1" for the default path).
+    Input events are stamped at every stage from pynput to the page and
+    aggregated into per-monitor latency histograms; the event, stats and
+    tracker pipelines record spans. Everything can be exported in Chrome's
+    trace-event format (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.output_path = None
+        self._origin = time.monotonic()
+        # Pages stamp with the wall clock; this maps it onto ours
+        self._wall_offset = time.time() - time.monotonic()
+
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._open = {}                     # trace id -> {"kind", "monitor", "stages": [(stage, t)]}
+        self.events = deque(maxlen=max_events)
+        self.histograms = {}                # monitor id -> {"kind:segment": LatencyHistogram}
+        self.counters = {"finished": 0, "coalesced": 0, "expired": 0}
+        self._threads = {}                  # timeline name -> Chrome tid
+
+    def enable(self, output_path=None):
+        self.enabled = True
+        self.output_path = output_path or DEFAULT_TRACE_PATH
+
+    def enable_from_env(self):
+        value = os.environ.get(ENV_VAR)
+        if value and value != "0":
+            self.enable(None if value == "1" else value)
+
+    def from_wall(self, seconds):
+        """A time.time() value (or a page's epoch stamp) on the monotonic clock."""
+        return seconds - self._wall_offset
+
+    # --- Input traces ---
+
+    def begin(self, kind, monitor, stage="pynput", at=None):
+        """Starts a trace for one input event; returns its id (None while disabled)."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            trace_id = self._next_id
+            self._next_id += 1
+            self._open[trace_id] = {"kind": kind, "monitor": monitor, "stages": [(stage, at or now)]}
+            stale = [tid for tid, t in self._open.items() if now - t["stages"][0][1] > EXPIRE_S]
+            for tid in stale:
+                del self._open[tid]
+            self.counters["expired"] += len(stale)
+        return trace_id
+
+    def stamp(self, trace_id, stage, at=None):
+        if trace_id is None:
+            return
+        with self._lock:
+            trace = self._open.get(trace_id)
+            if trace is not None:
+                trace["stages"].append((stage, at or time.monotonic()))
+
+    def drop(self, trace_id, reason="coalesced"):
+        if trace_id is None:
+            return
+        with self._lock:
+            if self._open.pop(trace_id, None) is not None:
+                self.counters[reason] = self.counters.get(reason, 0) + 1
+
+    def finish(self, trace_id, stage=None, at=None):
+        """Closes a trace: every hop becomes a histogram sample and a trace event."""
+        if trace_id is None:
+            return
+        with self._lock:
+            trace = self._open.pop(trace_id, None)
+        if trace is None:
+            return
+        if stage:
+            trace["stages"].append((stage, at or time.monotonic()))
+
+        kind, monitor = trace["kind"], trace["monitor"]
+        histograms = self.histograms.setdefault(monitor, {})
+        stages = trace["stages"]
+        for (_, start), (stage, end) in zip(stages, stages[1:]):
+            # Stamps from the page can land a hair before ours
+            end = max(end, start)
+            histograms.setdefault(f"{kind}:{stage}", LatencyHistogram()).add((end - start) * 1000)
+            self._add_event(f"{kind}.{stage}", "input", start, end, f"Monitor {monitor}", {"trace": trace_id})
+        first, last = stages[0][1], max(stages[-1][1], stages[0][1])
+        histograms.setdefault(f"{kind}:total", LatencyHistogram()).add((last - first) * 1000)
+        self.counters["finished"] += 1
+
+    # --- Spans (event, stats and tracker pipelines) ---
+
+    @contextmanager
+    def span(self, name, category, timeline, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._add_event(name, category, start, time.monotonic(), timeline, args)
+
+    def complete(self, name, category, start, end=None, timeline="main", **args):
+        """Records a span that was timed elsewhere (e.g. queued on another thread)."""
+        if self.enabled:
+            self._add_event(name, category, start, end or time.monotonic(), timeline, args)
+
+    def _add_event(self, name, category, start, end, timeline, args):
+        with self._lock:
+            tid = self._threads.setdefault(timeline, len(self._threads) + 1)
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(max(0.0, end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": args,
+        })
+
+    # --- Output ---
+
+    def latency_summary(self):
+        """{monitor: {"kind:stage": histogram summary}}; "kind:total" is end to end."""
+        return {
+            str(monitor): {key: hist.summary() for key, hist in sorted(hists.items())}
+            for monitor, hists in self.histograms.items()
+        }
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        with self._lock:
+            threads = dict(self._threads)
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "Mintpaper"}}]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                     for name, tid in threads.items()]
+        return {
+            "traceEvents": metadata + list(self.events),
+            "displayTimeUnit": "ms",
+            "otherData": {"latency": self.latency_summary(), "counters": dict(self.counters)},
+        }
+
+    def write(self, path=None):
+        if not self.enabled:
+            return None
+        path = path or self.output_path
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"Mintpaper: Trace written to {path} ({len(self.events)} events)")
+        return path
+
+    def report(self):
+        for monitor, hists in sorted(self.histograms.items(), key=lambda item: str(item[0])):
+            for key, hist in sorted(hists.items()):
+                s = hist.summary()
+                print(f"Mintpaper: Latency monitor {monitor} {key:<22} n={s['count']:<6} "
+                      f"p50<={s['p50_ms']} ms p95<={s['p95_ms']} ms max={s['max_ms']} ms")
+        print(f"Mintpaper: Traces finished={self.counters['finished']} coalesced={self.counters['coalesced']} "
+              f"expired={self.counters['expired']}")
+
+
+# One tracer per process
+tracer = MintpaperTracer()
@@ -1,22 +1,66 @@
-import subprocess
 import time
-from gi.repository import Gdk
+from gi.repository import Gdk, GLib
+from Xlib import X, Xatom, display as xdisplay, error as xerror
 from engine.base import MintpaperEvents
+from engine.coverage import coverage_by_monitor
+from engine.tracing import tracer
 
 class MintpaperTracker:
-    def __init__(self, engines=None):
+    def __init__(self, engines=None, mode="event"):
         self.engines = engines if engines is not None else []
+        self.mode = mode
         self.start_time = time.time()
-        
+
         # 95% coverage triggers the Coma Script. 0.1% triggers Mute.
-        self.pause_threshold = 0.95  
-        self.area_threshold_percent = 0.001 
+        self.pause_threshold = 0.95
+        self.area_threshold_percent = 0.001
         self.last_check_time = 0
-        self.check_cooldown = 0.5 
-        
+        self.check_cooldown = 0.5
+
         self.monitors = []
         self._detect_monitors()
 
+        # One long-lived X connection instead of forking wmctrl/xprop every tick.
+        # Per-window cache: wid -> {"geometry": (x, y, w, h) | None, "invalid": bool | None}
+        # A None field means "stale, ask the X server again on next use".
+        self.xdisplay = None
+        self.root = None
+        self.atoms = {}
+        self._window_cache = {}
+        self._connect()
+
+        # Event mode bookkeeping: what changed since the last recompute
+        self._frame_rects = {}      # WM frame wid -> last root-relative (x, y, w, h)
+        self._touched = {}          # client wid -> geometry before the change (or None)
+        self._dirty_monitors = set()
+        self._full_recompute = False
+        self._flush_pending = False
+        self._flush_requested_at = None
+        self._watch_id = None
+
+        # engine -> (paused, muted) as last sent, since one engine may cover several monitors
+        self._engine_state = {}
+
+    def _connect(self):
+        """Opens the persistent X11 connection and interns the EWMH atoms we read."""
+        try:
+            self.xdisplay = xdisplay.Display()
+        except Exception as e:
+            print(f"Mintpaper: Tracker could not connect to X11 ({e}). Occlusion tracking disabled.")
+            self.xdisplay = None
+            return
+
+        self.root = self.xdisplay.screen().root
+        for name in (
+            "_NET_CLIENT_LIST_STACKING",
+            "_NET_WM_STATE",
+            "_NET_WM_STATE_HIDDEN",
+            "_NET_WM_WINDOW_TYPE",
+            "_NET_WM_WINDOW_TYPE_DESKTOP",
+            "_NET_WM_WINDOW_TYPE_DOCK",
+        ):
+            self.atoms[name] = self.xdisplay.intern_atom(name)
+
     def _detect_monitors(self):
         """Maps out the physical boundaries of all connected displays."""
         display = Gdk.Display.get_default()
@@ -31,63 +75,309 @@ class MintpaperTracker:
                 "area": geo.width * geo.height,
                 "geometry": {"x": geo.x, "y": geo.y, "w": geo.width, "h": geo.height},
                 "was_paused": False,
-                "was_muted": False
+                "was_muted": False,
+                "coverage": 0.0
             })
 
+    def refresh_monitors(self):
+        """
+        Re-reads the monitor layout after a hot-plug. The table is updated in place;
+        monitors whose geometry didn't change keep their paused/muted state.
+        """
+        previous = {(m['geometry']['x'], m['geometry']['y'], m['geometry']['w'], m['geometry']['h']): m
+                    for m in self.monitors}
+        self.monitors.clear()
+        self._detect_monitors()
+        for m in self.monitors:
+            old = previous.get((m['geometry']['x'], m['geometry']['y'], m['geometry']['w'], m['geometry']['h']))
+            if old:
+                m['was_paused'] = old['was_paused']
+                m['was_muted'] = old['was_muted']
+                m['coverage'] = old['coverage']
+
+        # Drop engines that no longer exist, then recompute everything once
+        for engine in list(self._engine_state):
+            if engine not in self.engines:
+                del self._engine_state[engine]
+        # A freshly created engine starts unpaused, so its screens must start from scratch too
+        fresh_ids = {mid for e in self.engines if e not in self._engine_state for mid in e.monitor_ids()}
+        for m in self.monitors:
+            if m['id'] in fresh_ids:
+                m['was_paused'] = False
+                m['was_muted'] = False
+        self._full_recompute = True
+        if self._watch_id is not None:
+            self._schedule_flush()
+
+    def watch_events(self):
+        """
+        Switches the tracker to event-driven mode: the X connection fd is watched
+        from the GLib main loop and coverage is recomputed only when the WM reports
+        a change. Returns False if the caller should fall back to polling update().
+        """
+        if self.mode != "event" or not self.xdisplay:
+            return False
+
+        try:
+            self.root.change_attributes(event_mask=X.SubstructureNotifyMask | X.PropertyChangeMask)
+            self.xdisplay.flush()
+        except (xerror.XError, xerror.ConnectionClosedError):
+            return False
+
+        self._watch_id = GLib.io_add_watch(
+            self.xdisplay.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_x_readable
+        )
+
+        # Seed the state once so monitors that are already covered get paused
+        self._full_recompute = True
+        self._schedule_flush()
+        print("Mintpaper: Tracker running in event-driven mode.")
+        return True
+
     def update(self):
-        """The main loop. Calculates window occlusion and dispatches events."""
+        """The polling loop. Calculates window occlusion and dispatches events."""
         current_time = time.time()
         if current_time - self.last_check_time < self.check_cooldown:
             return
         self.last_check_time = current_time
 
-        if not self.engines:
+        if not self.engines or not self.xdisplay:
             return
 
-        # Bulletproof subprocess call to avoid crashes if X11 stutters
+        # Bulletproof X11 access to avoid crashes if the server stutters
         try:
-            output = subprocess.check_output(
-                ["wmctrl", "-lG"], 
-                encoding="utf-8", 
-                stderr=subprocess.DEVNULL,
-                timeout=0.2 
-            )
-            window_lines = output.strip().split('\n')
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            with tracer.span("tracker.poll", "tracker", "Tracker"):
+                self._drain_events()
+                current_coverage = self._compute_coverage(self.monitors)
+        except (xerror.XError, xerror.ConnectionClosedError):
             return
 
-        current_coverage = {m['id']: 0 for m in self.monitors}
-        
+        # Polling recomputes everything anyway, so drop the event-mode bookkeeping
+        self._touched.clear()
+        self._dirty_monitors.clear()
+
+        self._dispatch_state_changes(current_coverage)
+
+    def _compute_coverage(self, monitors):
+        """Returns {monitor_id: coverage} for the given monitors from the current client list."""
+        client_wids = self._get_client_list()
+
         # Collect our own engine X11 Window IDs so we don't track ourselves
-        engine_wids = set()
+        engine_wids = {}
         for e in self.engines:
             if e.window and e.window.get_window():
-                engine_wids.add(hex(e.window.get_window().get_xid()))
+                engine_wids[e.window.get_window().get_xid()] = e.monitor_ids()
 
-        for line in window_lines:
-            parts = line.split()
-            if len(parts) < 6: 
+        # The stacking list is bottom-to-top, so anything below a monitor's own
+        # wallpaper window can't be hiding it
+        floor = {m['id']: -1 for m in monitors}
+        for index, wid in enumerate(client_wids):
+            for mid in engine_wids.get(wid, ()):
+                if mid in floor:
+                    floor[mid] = index
+
+        # Walked top to bottom: once a window covers a monitor completely, nothing
+        # below it matters there, and when that's true for every monitor we stop
+        # asking X about the rest of the stack
+        visible_rects = {m['id']: [] for m in monitors}
+        open_monitors = list(monitors)
+        for index in range(len(client_wids) - 1, -1, -1):
+            open_monitors = [m for m in open_monitors if index > floor[m['id']]]
+            if not open_monitors:
+                break
+            wid = client_wids[index]
+            if wid in engine_wids:
                 continue
-                
-            wid = parts[0]
-            if wid in engine_wids: 
+
+            geometry = self._get_geometry(wid)
+            if geometry is None:
                 continue
-            
-            # Parse X11 geometry: X, Y, Width, Height
-            wx, wy, ww, wh = int(parts[2]), int(parts[3]), int(parts[4]), int(parts[5])
-
-            for m in self.monitors:
-                overlap = self._calculate_overlap(wx, wy, ww, wh, m['geometry'])
-                coverage = overlap / m['area']
-                
-                # Only check validity if it actually covers the screen to save CPU cycles
-                if coverage > self.area_threshold_percent:
-                    if not self._is_invalid_window(wid):
-                        current_coverage[m['id']] = max(current_coverage[m['id']], coverage)
+            wx, wy, ww, wh = geometry
 
-        self._dispatch_state_changes(current_coverage)
+            for m in list(open_monitors):
+                geo = m['geometry']
+                # Only check validity if it actually touches the screen to save round trips
+                overlap = self._calculate_overlap(wx, wy, ww, wh, geo)
+                if overlap > 0 and not self._is_invalid_window(wid):
+                    visible_rects[m['id']].append(geometry)
+                    if overlap >= geo['w'] * geo['h']:
+                        open_monitors.remove(m)
+
+        return coverage_by_monitor(visible_rects, monitors)
+
+    # --- Event-driven mode ---
+
+    def _on_x_readable(self, fd, condition):
+        try:
+            self._drain_events()
+        except xerror.ConnectionClosedError:
+            print("Mintpaper: Tracker lost its X11 connection. Occlusion tracking stopped.")
+            self.xdisplay = None
+            self._watch_id = None
+            return False
+
+        if self._full_recompute or self._dirty_monitors or self._touched:
+            self._schedule_flush()
+        return True
+
+    def _schedule_flush(self):
+        """Coalesces a burst of X events into a single recompute on the next idle."""
+        if not self._flush_pending:
+            self._flush_pending = True
+            self._flush_requested_at = time.monotonic()
+            GLib.idle_add(self._flush_changes)
+
+    def _flush_changes(self):
+        self._flush_pending = False
+        if not self.engines or not self.xdisplay:
+            return False
+
+        # From the first X event of the burst to the recompute
+        tracer.complete("tracker.queue", "tracker", self._flush_requested_at or time.monotonic(), timeline="Tracker")
+        with tracer.span("tracker.flush", "tracker", "Tracker", windows=len(self._touched)):
+            self._recompute_dirty()
+        return False
+
+    def _recompute_dirty(self):
+        try:
+            # Resolve touched clients into monitors using their old and new rectangles
+            for wid, old_geometry in self._touched.items():
+                self._mark_rect_dirty(old_geometry)
+                self._mark_rect_dirty(self._get_geometry(wid))
+            self._touched.clear()
 
-    
+            if self._full_recompute:
+                monitors = self.monitors
+            else:
+                monitors = [m for m in self.monitors if m['id'] in self._dirty_monitors]
+            self._full_recompute = False
+            self._dirty_monitors.clear()
+
+            if monitors:
+                self._dispatch_state_changes(self._compute_coverage(monitors))
+
+            # Our own round trips may have buffered events without the fd becoming readable again
+            if self.xdisplay.pending_events():
+                self._on_x_readable(None, None)
+        except (xerror.XError, xerror.ConnectionClosedError):
+            pass
+
+    def _mark_rect_dirty(self, rect):
+        if rect is None:
+            return
+        wx, wy, ww, wh = rect
+        for m in self.monitors:
+            if self._calculate_overlap(wx, wy, ww, wh, m['geometry']) > 0:
+                self._dirty_monitors.add(m['id'])
+
+    def _touch_client(self, wid, entry):
+        if wid not in self._touched:
+            self._touched[wid] = entry["geometry"]
+
+    def _handle_root_event(self, event):
+        """Substructure events on the root describe WM frames, which are root-relative."""
+        if event.type == X.PropertyNotify:
+            if event.atom == self.atoms["_NET_CLIENT_LIST_STACKING"]:
+                self._full_recompute = True
+            return
+
+        frame = event.window.id
+        old_rect = self._frame_rects.get(frame)
+
+        if event.type == X.ConfigureNotify:
+            new_rect = (event.x, event.y, event.width, event.height)
+            self._frame_rects[frame] = new_rect
+            if old_rect is None:
+                self._full_recompute = True
+                return
+            self._mark_rect_dirty(old_rect)
+            self._mark_rect_dirty(new_rect)
+
+            # The client inside this frame moved too; refetch anything that sat under it
+            ox, oy, ow, oh = old_rect
+            for wid, entry in self._window_cache.items():
+                geo = entry["geometry"]
+                if geo and self._calculate_overlap(geo[0], geo[1], geo[2], geo[3],
+                                                   {"x": ox, "y": oy, "w": ow, "h": oh}) > 0:
+                    self._touch_client(wid, entry)
+                    entry["geometry"] = None
+        else:
+            # Map/Unmap/Destroy: we only know where the frame was if it configured before
+            if event.type == X.DestroyNotify:
+                self._frame_rects.pop(frame, None)
+            if old_rect is None:
+                self._full_recompute = True
+            else:
+                self._mark_rect_dirty(old_rect)
+
+    def _drain_events(self):
+        """Consumes queued X events and invalidates the cache entries they touch."""
+        while self.xdisplay.pending_events():
+            event = self.xdisplay.next_event()
+            window = getattr(event, 'window', None)
+            if window is None:
+                continue
+
+            # SubstructureNotify on the root reports the child in .window and the root in .event
+            source = getattr(event, 'event', window)
+            if source.id == self.root.id:
+                self._handle_root_event(event)
+                continue
+
+            wid = window.id
+            entry = self._window_cache.get(wid)
+            if entry is None:
+                continue
+
+            if event.type == X.PropertyNotify:
+                if event.atom in (self.atoms["_NET_WM_STATE"], self.atoms["_NET_WM_WINDOW_TYPE"]):
+                    self._touch_client(wid, entry)
+                    entry["invalid"] = None
+            elif event.type == X.ConfigureNotify:
+                self._touch_client(wid, entry)
+                entry["geometry"] = None
+            elif event.type == X.DestroyNotify:
+                self._mark_rect_dirty(self._touched.pop(wid, entry["geometry"]))
+                self._window_cache.pop(wid, None)
+
+    def _get_client_list(self):
+        """Reads the WM's managed windows, bottom-to-top, and prunes dead cache entries."""
+        prop = self.root.get_full_property(self.atoms["_NET_CLIENT_LIST_STACKING"], Xatom.WINDOW)
+        client_wids = list(prop.value) if prop else []
+
+        alive = set(client_wids)
+        for wid in list(self._window_cache):
+            if wid not in alive:
+                del self._window_cache[wid]
+
+        return client_wids
+
+    def _get_cache_entry(self, wid):
+        """Returns the cache entry for a window, subscribing to its change events on first sight."""
+        entry = self._window_cache.get(wid)
+        if entry is None:
+            entry = {"geometry": None, "invalid": None}
+            self._window_cache[wid] = entry
+            window = self.xdisplay.create_resource_object('window', wid)
+            window.change_attributes(
+                event_mask=X.PropertyChangeMask | X.StructureNotifyMask,
+                onerror=xerror.CatchError(xerror.BadWindow)
+            )
+        return entry
+
+    def _get_geometry(self, wid):
+        """Returns the window's root-relative (x, y, w, h), or None if it vanished."""
+        entry = self._get_cache_entry(wid)
+        if entry["geometry"] is None:
+            window = self.xdisplay.create_resource_object('window', wid)
+            try:
+                geo = window.get_geometry()
+                origin = self.root.translate_coords(window, 0, 0)
+            except xerror.XError:
+                self._window_cache.pop(wid, None)
+                return None
+            entry["geometry"] = (origin.x, origin.y, geo.width, geo.height)
+        return entry["geometry"]
 
     def _calculate_overlap(self, wx, wy, ww, wh, m_geo):
         """Standard AABB intersection math to find overlapping area."""
@@ -97,36 +387,64 @@ class MintpaperTracker:
 
     def _dispatch_state_changes(self, current_coverage):
         """Compares new state to old state and fires events ONLY if changed."""
+        changed = set()
         for m in self.monitors:
             mid = m['id']
+            if mid not in current_coverage:
+                continue
             coverage = current_coverage[mid]
-            
+            m['coverage'] = coverage
+
             should_pause = coverage > self.pause_threshold
             should_mute = coverage > self.area_threshold_percent
 
-            # Fire PAUSE events via the Contract
-            if should_pause != m['was_paused']:
+            if should_pause != m['was_paused'] or should_mute != m['was_muted']:
                 m['was_paused'] = should_pause
-                for engine in self.engines:
-                    if engine.mon.get('id') == mid:
-                        engine.handle_event(MintpaperEvents.SET_PAUSED, {"should_pause": should_pause})
+                m['was_muted'] = should_mute
+                changed.add(mid)
+
+        if not changed:
+            return
+
+        states = {m['id']: m for m in self.monitors}
+        for engine in self.engines:
+            ids = [mid for mid in engine.monitor_ids() if mid in states]
+            if not ids or changed.isdisjoint(ids):
+                continue
+
+            # A spanning engine is only paused when every screen it covers is hidden,
+            # but any covered screen is enough to mute it
+            should_pause = all(states[mid]['was_paused'] for mid in ids)
+            should_mute = any(states[mid]['was_muted'] for mid in ids)
+            last_pause, last_mute = self._engine_state.get(engine, (False, False))
+
+            # Fire PAUSE events via the Contract
+            if should_pause != last_pause:
+                engine.handle_event(MintpaperEvents.SET_PAUSED, {"should_pause": should_pause})
 
             # Fire MUTE events via the Contract
-            if should_mute != m['was_muted']:
-                m['was_muted'] = should_mute
-                for engine in self.engines:
-                    if engine.mon.get('id') == mid:
-                        engine.handle_event(MintpaperEvents.SET_MUTED, {"should_mute": should_mute})
+            if should_mute != last_mute:
+                engine.handle_event(MintpaperEvents.SET_MUTED, {"should_mute": should_mute})
+
+            self._engine_state[engine] = (should_pause, should_mute)
 
     def _is_invalid_window(self, wid):
-        """Checks if a window is minimized or a desktop widget."""
+        """Checks if a window is minimized or a desktop widget (cached until PropertyNotify)."""
+        entry = self._get_cache_entry(wid)
+        if entry["invalid"] is None:
+            entry["invalid"] = self._read_invalid(wid)
+        return entry["invalid"]
+
+    def _read_invalid(self, wid):
+        window = self.xdisplay.create_resource_object('window', wid)
         try:
-            state = subprocess.check_output(["xprop", "-id", wid, "_NET_WM_STATE"], encoding="utf-8", stderr=subprocess.DEVNULL)
-            if "_NET_WM_STATE_HIDDEN" in state: return True
-            
-            w_type = subprocess.check_output(["xprop", "-id", wid, "_NET_WM_WINDOW_TYPE"], encoding="utf-8", stderr=subprocess.DEVNULL)
-            if "_NET_WM_WINDOW_TYPE_DESKTOP" in w_type or "_NET_WM_WINDOW_TYPE_DOCK" in w_type: return True
-            
+            state = window.get_full_property(self.atoms["_NET_WM_STATE"], Xatom.ATOM)
+            if state and self.atoms["_NET_WM_STATE_HIDDEN"] in state.value: return True
+
+            w_type = window.get_full_property(self.atoms["_NET_WM_WINDOW_TYPE"], Xatom.ATOM)
+            if w_type and (self.atoms["_NET_WM_WINDOW_TYPE_DESKTOP"] in w_type.value
+                           or self.atoms["_NET_WM_WINDOW_TYPE_DOCK"] in w_type.value): return True
+
             return False
-        except Exception:
-            return True
\ No newline at end of file
+        except xerror.XError:
+            return True
@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+
+from gi.repository import GLib
+
+DEFAULT_OPTIONS = {
+    "enabled": False,
+    "dir": os.path.join("~", ".cache", "mintpaper", "variants"),
+    "budget_mb": 4096,      # disk space variants may use before the least recently played go
+    "ffmpeg": "ffmpeg",
+    "ffprobe": "ffprobe",
+    "crf": 20,
+    "preset": "medium",
+    "audio_bitrate": "160k",
+    "threads": 2,           # kept low so a transcode doesn't starve the wallpapers it is for
+}
+
+# Bytes read from each end of a source to fingerprint it; hashing a whole 4K video would take seconds
+HASH_CHUNK = 4 * 1024 * 1024
+
+
+def source_hash(path):
+    """Fingerprint from the size and the first/last chunks of the file."""
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(HASH_CHUNK))
+        if size > HASH_CHUNK:
+            f.seek(max(HASH_CHUNK, size - HASH_CHUNK))
+            digest.update(f.read(HASH_CHUNK))
+    return digest.hexdigest()[:16]
+
+
+def probe(path, ffprobe="ffprobe"):
+    """{"width", "height", "fps", "duration"} of the first video stream, or None."""
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height,avg_frame_rate:format=duration", "-of", "json", path],
+            capture_output=True, text=True, timeout=30
+        )
+        info = json.loads(result.stdout)
+        stream = info["streams"][0]
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError, IndexError):
+        return None
+
+    num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+    try:
+        fps = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        fps = 0.0
+    return {
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "fps": round(fps, 3),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+    }
+
+
+def target_size(source, screen):
+    """
+    Smallest even size that still covers the screen at the source's aspect ratio
+    (mpv letterboxes/crops the same way it did before). None if no smaller than the source.
+    """
+    w, h = source
+    scale = max(screen[0] / w, screen[1] / h)
+    if scale >= 1.0:
+        return None
+    return max(2, round(w * scale / 2) * 2), max(2, round(h * scale / 2) * 2)
+
+
+def ffmpeg_command(src, dst, size, fps, options):
+    filters = []
+    if size:
+        filters.append(f"scale={size[0]}:{size[1]}:flags=lanczos")
+    if fps:
+        filters.append(f"fps={fps}")
+    return [
+        options["ffmpeg"], "-v", "error", "-y", "-i", src,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-vf", ",".join(filters),
+        # H.264 is the codec every hwdec path can take
+        "-c:v", "libx264", "-preset", options["preset"], "-crf", str(options["crf"]),
+        # Re-encoded: webm/mkv sources often carry Vorbis or Opus, which MP4 can't take as is
+        "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", options.get("audio_bitrate", "160k"),
+        "-threads", str(options["threads"]), "-movflags", "+faststart",
+        "-f", "mp4", dst,
+    ]
+
+
+class MintpaperTranscodeCache:
+    """
+    Pre-renders videos at the size and frame rate a monitor actually shows, so
+    mpv stops decoding pixels and frames that are thrown away. Variants are
+    keyed on the source's fingerprint, the target size and the fps limit, made
+    one at a time by a niced ffmpeg on a background thread, and evicted least
+    recently played first once the cache is over its disk budget.
+    """
+    _shared = None
+
+    @classmethod
+    def get(cls, options=None):
+        if cls._shared is None:
+            cls._shared = cls(options)
+        return cls._shared
+
+    def __init__(self, options=None):
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        self.dir = os.path.expanduser(self.options["dir"])
+        self.budget = int(self.options["budget_mb"] * 1024 * 1024)
+
+        self.in_use = {}            # variant path -> number of players on it
+        self.jobs = deque(maxlen=50)  # finished/failed transcodes, newest last
+        self._failed = None         # source hash -> last ffmpeg error (worker thread only, loaded lazily)
+        self._queue = queue.Queue()
+        self._worker = None
+
+    @property
+    def enabled(self):
+        return bool(self.options.get("enabled"))
+
+    # --- Lookup ---
+
+    def key_for(self, source, screen, fps, digest=None):
+        return f"{digest or source_hash(source)}-{screen[0]}x{screen[1]}-{fps}"
+
+    def path_for(self, key):
+        return os.path.join(self.dir, key + ".mp4")
+
+    def request(self, source, screen, fps, callback):
+        """
+        Calls callback(path) on the GTK loop with the variant for this screen
+        size (device pixels) and fps, once it exists. callback(None) means the
+        original is already as small as it gets, or the transcode failed.
+        Hashing and probing happen on the worker, so this never blocks.
+        """
+        if not self.enabled:
+            return
+        self._queue.put((source, tuple(screen), int(fps), callback))
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name="mintpaper-transcode", daemon=True)
+            self._worker.start()
+
+    def acquire(self, path):
+        self.in_use[path] = self.in_use.get(path, 0) + 1
+        try:
+            # Play time is the LRU order
+            os.utime(path)
+        except OSError:
+            pass
+
+    def release(self, path):
+        if path in self.in_use:
+            self.in_use[path] -= 1
+            if self.in_use[path] <= 0:
+                del self.in_use[path]
+
+    # --- Worker thread ---
+
+    def _work(self):
+        while True:
+            source, screen, fps, callback = self._queue.get()
+            try:
+                digest = source_hash(source)
+            except OSError as e:
+                print(f"Mintpaper: Can't read {source} for transcoding ({e})")
+                GLib.idle_add(callback, None)
+                continue
+
+            key = self.key_for(source, screen, fps, digest)
+            path = self.path_for(key)
+            if not os.path.exists(path):
+                if digest in self._failed_sources():
+                    # ffmpeg already gave up on this exact file; don't retry it every session
+                    path = None
+                else:
+                    path = self._transcode(source, screen, fps, key, digest)
+            GLib.idle_add(callback, path)
+
+    def _failed_path(self):
+        return os.path.join(self.dir, "failed.json")
+
+    def _failed_sources(self):
+        if self._failed is None:
+            try:
+                with open(self._failed_path(), 'r') as f:
+                    self._failed = json.load(f)
+            except (OSError, ValueError):
+                self._failed = {}
+        return self._failed
+
+    def _remember_failure(self, digest, source, error):
+        self._failed_sources()[digest] = {"source": source, "error": error, "time": time.time()}
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(self._failed_path(), 'w') as f:
+                json.dump(self._failed, f, indent=4)
+        except OSError as e:
+            print(f"Mintpaper: Couldn't record the failed transcode ({e})")
+
+    def _transcode(self, source, screen, fps, key, digest):
+        info = probe(source, self.options["ffprobe"])
+        if not info or not info["width"] or not info["height"]:
+            print(f"Mintpaper: Couldn't probe {source}; playing the original.")
+            return None
+
+        size = target_size((info["width"], info["height"]), screen)
+        keep_fps = info["fps"] and fps >= info["fps"]
+        if size is None and keep_fps:
+            return None
+
+        os.makedirs(self.dir, exist_ok=True)
+        path = self.path_for(key)
+        part = path + ".part"
+        command = ffmpeg_command(source, part, size, None if keep_fps else fps, self.options)
+        out_w, out_h = size or (info["width"], info["height"])
+        print(f"Mintpaper: Transcoding {os.path.basename(source)} "
+              f"{info['width']}x{info['height']}@{info['fps']:g} -> "
+              f"{out_w}x{out_h}@{info['fps'] if keep_fps else fps:g}")
+
+        start = time.monotonic()
+        ran = True
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, preexec_fn=lambda: os.nice(10))
+            failed = result.returncode != 0
+            error = result.stderr.strip().splitlines()[-1:] if failed else []
+        except OSError as e:
+            failed, error, ran = True, [str(e)], False
+
+        job = {"time": time.time(), "source": source, "key": key,
+               "seconds": round(time.monotonic() - start, 1), "ok": not failed}
+        if failed:
+            job["error"] = error[0] if error else "ffmpeg failed"
+            print(f"Mintpaper: Transcode of {source} failed ({job['error']})")
+            self._unlink(part)
+            self.jobs.append(job)
+            # A missing ffmpeg says nothing about the source, so only real failures are remembered
+            if ran:
+                self._remember_failure(digest, source, job["error"])
+            return None
+
+        os.replace(part, path)
+        job["bytes_before"] = os.path.getsize(source)
+        job["bytes_after"] = os.path.getsize(path)
+        self.jobs.append(job)
+        self._evict(keep=path)
+        return path
+
+    # --- Disk budget ---
+
+    def _variants(self):
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return []
+        variants = []
+        for name in names:
+            if not name.endswith(".mp4"):
+                continue
+            path = os.path.join(self.dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            variants.append((st.st_mtime, st.st_size, path))
+        return variants
+
+    def _evict(self, keep=None):
+        variants = sorted(self._variants())
+        total = sum(size for _, size, _ in variants)
+        for _, size, path in variants:
+            if total <= self.budget:
+                break
+            # in_use is only written on the GTK loop; a stale read just spares a file one round
+            if path == keep or path in self.in_use:
+                continue
+            self._unlink(path)
+            total -= size
+            print(f"Mintpaper: Evicted video variant {os.path.basename(path)}")
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def report(self):
+        variants = self._variants()
+        return {
+            "dir": self.dir,
+            "variants": len(variants),
+            "disk_mb": round(sum(size for _, size, _ in variants) / (1024 * 1024), 1),
+            "budget_mb": round(self.budget / (1024 * 1024), 1),
+            "in_use": len(self.in_use),
+            "queued": self._queue.qsize(),
+            "failed_sources": len(self._failed or {}),
+            "jobs": list(self.jobs)[-10:],
+        }
@@ -0,0 +1,221 @@
+import os
+import time
+from collections import deque
+
+import psutil
+from gi.repository import GLib
+
+DEFAULT_OPTIONS = {
+    "enabled": True,
+    "interval": 5,        # seconds between samples
+    "sustain_s": 60,      # a budget must be exceeded this long before a recycle
+    # Memory only by default: reloading fixes a leak, but a preset that is busy by
+    # design (or software-decoded video) would be busy again right after every reload
+    "default": {"rss_mb": 1024, "cpu_percent": None},
+    # Per-preset overrides, keyed by the preset's folder name, e.g.
+    # "Frieren(cont)": {"rss_mb": 600, "cpu_percent": 80}
+    "presets": {},
+}
+
+
+class MintpaperWatchdog:
+    """
+    Samples each engine's renderer (its WebKit web process, or its mpv threads
+    inside our process) and reloads the preset when it stays over its memory
+    or CPU budget for too long. Samples are kept as a time series.
+    """
+
+    def __init__(self, engines, recycle, options=None, history_size=720):
+        self.engines = engines
+        self.recycle = recycle      # callback(engine, reason)
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+
+        self.series = deque(maxlen=history_size)
+        self.recycles = deque(maxlen=50)
+        self.recycle_count = 0      # every recycle since start; `recycles` only keeps the latest
+
+        self._over_since = {}       # (engine or ("pid", pid), metric) -> monotonic time the budget was first exceeded
+        self._running_since = {}    # engine -> (preset, monotonic time it was first measured with it)
+        self._cpu_last = {}         # ("pid", pid) or ("tid", tid) -> (monotonic, cpu seconds, percent)
+        self._cooldown_until = {}   # engine -> monotonic time
+        self._timer = None
+
+    @property
+    def enabled(self):
+        return bool(self.options.get("enabled"))
+
+    def start(self):
+        if self.enabled and self._timer is None:
+            self._timer = GLib.timeout_add_seconds(self.options["interval"], self._tick)
+
+    def stop(self):
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+            self._timer = None
+
+    def budget_for(self, engine):
+        preset = engine.mon.get('active_preset_path', '')
+        name = os.path.basename(os.path.dirname(os.path.abspath(preset))) if preset else ''
+        budget = dict(self.options["default"])
+        budget.update(self.options["presets"].get(name, {}))
+        return budget
+
+    # --- Sampling ---
+
+    def _tick(self):
+        now = time.monotonic()
+        samples = []
+        owners = {}
+        for engine in self.engines:
+            plugin = engine.plugin
+            owner = plugin.resource_owner() if plugin and not plugin.is_asleep else None
+            if owner is None:
+                continue
+            sample = self._measure(engine, plugin, owner, now)
+            if sample:
+                samples.append((engine, sample))
+                if sample["pid"]:
+                    owners.setdefault(sample["pid"], []).append(engine)
+
+        for engine, sample in samples:
+            sample["shared"] = len(owners.get(sample["pid"], ())) > 1
+            self.series.append(sample)
+            preset = engine.mon.get('active_preset_path')
+            if self._running_since.get(engine, (None,))[0] != preset:
+                self._running_since[engine] = (preset, now)
+            if not sample["shared"]:
+                self._check_budget(engine, sample, now)
+
+        # Engines whose pages share one web process can't be told apart: the process is
+        # held to the sum of their budgets, and only one of them is recycled at a time
+        for pid, engines in owners.items():
+            if len(engines) > 1:
+                sample = next(s for e, s in samples if e is engines[0])
+                self._check_shared(pid, engines, sample, now)
+
+        for engine in list(self._cooldown_until) + list(self._running_since):
+            if engine not in self.engines:
+                self._forget(engine)
+                self._running_since.pop(engine, None)
+        for key in [k for k in self._over_since if isinstance(k[0], tuple) and k[0][1] not in owners]:
+            del self._over_since[key]
+        # Processes and threads that are gone don't need a CPU baseline anymore
+        for key in [k for k, last in self._cpu_last.items() if last[0] != now]:
+            del self._cpu_last[key]
+        return True
+
+    def _measure(self, engine, plugin, owner, now):
+        rss_mb, cpu = None, None
+        pid = owner.get("pid")
+        try:
+            if pid:
+                proc = psutil.Process(pid)
+                rss_mb = round(proc.memory_info().rss / (1024 * 1024), 1)
+                times = proc.cpu_times()
+                cpu = self._cpu_percent(("pid", pid), times.user + times.system, now)
+            elif owner.get("tids"):
+                # libmpv shares our address space, so only CPU can be attributed per engine
+                threads = {t.id: t for t in psutil.Process().threads()}
+                cpu = 0.0
+                for tid in owner["tids"]:
+                    thread = threads.get(tid)
+                    if thread is not None:
+                        cpu += self._cpu_percent(("tid", tid), thread.user_time + thread.system_time, now) or 0.0
+        except psutil.Error:
+            return None
+
+        return {
+            "time": time.time(),
+            "monitor": engine.mon.get('id'),
+            "preset": engine.mon.get('active_preset_path'),
+            "plugin": plugin.__class__.__name__,
+            "pid": pid,
+            "threads": len(owner.get("tids", ())),
+            "rss_mb": rss_mb,
+            "cpu_percent": round(cpu, 1) if cpu is not None else None,
+        }
+
+    def _cpu_percent(self, key, cpu_seconds, now):
+        """Percent of one core since the last sample of this process/thread; None on first sight."""
+        last = self._cpu_last.get(key)
+        if last is not None and last[0] == now:
+            # Already measured this tick for another engine on the same web process
+            return last[2]
+        percent = None if last is None else max(0.0, (cpu_seconds - last[1]) / (now - last[0]) * 100)
+        self._cpu_last[key] = (now, cpu_seconds, percent)
+        return percent
+
+    # --- Budgets ---
+
+    def _check_budget(self, engine, sample, now):
+        if now < self._cooldown_until.get(engine, 0):
+            return
+        reason = self._over_budget(engine, sample, self.budget_for(engine), now)
+        if reason:
+            self._do_recycle(engine, reason, now)
+
+    def _check_shared(self, pid, engines, sample, now):
+        if any(now < self._cooldown_until.get(engine, 0) for engine in engines):
+            return
+
+        # One engine without a limit leaves the whole process unlimited on that metric
+        budgets = [self.budget_for(engine) for engine in engines]
+        budget = {metric: sum(b[metric] for b in budgets) if all(b.get(metric) for b in budgets) else None
+                  for metric in ("rss_mb", "cpu_percent")}
+        reason = self._over_budget(("pid", pid), sample, budget, now)
+        if not reason:
+            return
+
+        # The preset that has been running the longest is the likeliest to have leaked
+        engine = min(engines, key=lambda e: self._running_since.get(e, (None, now))[1])
+        self._over_since = {k: v for k, v in self._over_since.items() if k[0] != ("pid", pid)}
+        self._do_recycle(engine, f"{reason} (web process {pid} shared by {len(engines)} monitors, "
+                                 f"recycling the longest-running preset)", now)
+
+    def _over_budget(self, key, sample, budget, now):
+        """A reason string once a metric has been over its limit for sustain_s, else None."""
+        for metric in ("rss_mb", "cpu_percent"):
+            limit = budget.get(metric)
+            value = sample[metric]
+            if not limit or value is None or value <= limit:
+                self._over_since.pop((key, metric), None)
+                continue
+
+            since = self._over_since.setdefault((key, metric), now)
+            if now - since >= self.options["sustain_s"]:
+                return f"{metric}={value} over budget {limit} for {now - since:.0f}s"
+        return None
+
+    def _do_recycle(self, engine, reason, now):
+        print(f"Mintpaper: Watchdog recycling monitor {engine.mon.get('id')} "
+              f"({engine.mon.get('active_preset_path')}): {reason}")
+        self.recycles.append({"time": time.time(), "monitor": engine.mon.get('id'),
+                              "preset": engine.mon.get('active_preset_path'), "reason": reason})
+        self.recycle_count += 1
+        self._forget(engine)
+        # Give the reloaded preset a full window before judging it again
+        self._cooldown_until[engine] = now + self.options["sustain_s"]
+        self.recycle(engine, reason)
+
+    def _forget(self, engine):
+        self._cooldown_until.pop(engine, None)
+        for key in [k for k in self._over_since if k[0] is engine]:
+            del self._over_since[key]
+
+    # --- Time series ---
+
+    def get_series(self, seconds=None, monitor=None):
+        """Samples oldest first, optionally limited to the last `seconds` and one monitor id."""
+        cutoff = time.time() - seconds if seconds is not None else None
+        return [
+            s for s in self.series
+            if (cutoff is None or s["time"] >= cutoff) and (monitor is None or s["monitor"] == monitor)
+        ]
+
+    def latest(self):
+        """The newest sample per monitor."""
+        newest = {}
+        for s in self.series:
+            newest[s["monitor"]] = s
+        return list(newest.values())
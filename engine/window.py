@@ -1,6 +1,20 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib
+import time
+from collections import deque
+
+from engine.manifest import INPUT_EVENTS
+from engine.profiler import profiler
+from engine.tracing import tracer
+
+# Plugin setting -> monitor entry key in config.json, and the event that applies it live
+SETTING_KEYS = {"muted": "is_muted", "volume": "volume", "fps_limit": "fps_limit"}
+CONFIG_EVENTS = {
+    "is_muted": ("SET_MUTED", "should_mute"),
+    "volume": ("SET_VOLUME", "volume"),
+    "fps_limit": ("SET_FPS", "fps"),
+}
 
 class MintpaperEngine:
     def __init__(self, mon_data):
@@ -18,43 +32,216 @@ class MintpaperEngine:
         self.window.set_accept_focus(False)
         self.window.set_skip_taskbar_hint(True)
         
-        geo = mon_data.get('geometry', mon_data) 
-        self.window.move(geo['x'], geo['y'])
-        self.window.resize(geo['w'], geo['h'])
+        self._geometry = None
+        self.apply_geometry()
         
-        self.container = Gtk.Box()
+        # Each plugin draws into its own page of the stack, so a new preset can
+        # load off-screen while the old one keeps showing
+        self.container = Gtk.Stack()
+        self.container.set_transition_type(Gtk.StackTransitionType.NONE)
         self.window.add(self.container)
         
         self.plugin = None
+        self.pending_plugin = None
+        self._swap_started = None
+        self._swap_timeout_id = None
+        self.swap_timeout_ms = 5000
+        self.swap_latencies_ms = deque(maxlen=20)
+
+        self.is_paused = False
+        self.stats_sampler = None
+        # Temporary ceiling set by the fps governor (None = no throttling)
+        self.fps_cap = None
+        # Last tracker state, replayed onto a freshly swapped-in plugin
+        self._state_events = {}
+        # event type -> how many this engine has routed (control socket metrics)
+        self.event_counts = {}
+        # callback(engine) once a load ends, swapped in or failed (the app re-checks its input sources)
+        self.on_swapped = None
 
         # --- THE JANK TIMER (For the Dev Diary) ---
         # Wait 2000ms, then force the X11 window to the bottom of the stack
         GLib.timeout_add(2000, self._jank_push_back)
 
+    def apply_geometry(self):
+        """Moves the window onto this engine's monitor. The plugin keeps running."""
+        geo = dict(self.mon.get('geometry', self.mon))
+        if geo == self._geometry:
+            return False
+        self._geometry = geo
+        self.window.move(geo['x'], geo['y'])
+        self.window.resize(geo['w'], geo['h'])
+        return True
+
+    def destroy(self):
+        """Tears down both plugins and the window, for a monitor that went away."""
+        if self._swap_timeout_id:
+            GLib.source_remove(self._swap_timeout_id)
+            self._swap_timeout_id = None
+        for plugin in (self.pending_plugin, self.plugin):
+            if plugin:
+                self._discard(plugin)
+        self.plugin = None
+        self.pending_plugin = None
+        self.window.destroy()
+
     def _jank_push_back(self):
         """The infamous wait-and-pray method."""
         if self.window.get_window():
             print("Mintpaper: 2000ms elapsed. Forcing window to background.")
             self.window.get_window().lower()
+            profiler.mark("jank_push_back", monitor=self.mon.get('id'))
         return False # Returning False stops the timer from repeating
 
     def load_plugin(self, plugin_class, settings):
-        if self.plugin:
-            self.plugin.teardown()
-            for child in self.container.get_children():
-                self.container.remove(child)
+        """
+        Double-buffered swap: the new plugin is built in a hidden page and only
+        replaces the current one once it reports its first frame (or times out).
+        """
+        if self.pending_plugin:
+            # Its timeout would otherwise fire later and clobber the new plugin's timer id
+            if self._swap_timeout_id:
+                GLib.source_remove(self._swap_timeout_id)
+                self._swap_timeout_id = None
+            self._discard(self.pending_plugin)
+            self.pending_plugin = None
+
+        page = Gtk.Box()
+        self.container.add(page)
+        page.show()
 
-        self.plugin = plugin_class(self, settings)
-        if not self.plugin.setup():
+        plugin = plugin_class(self, settings)
+        plugin.container = page
+        self.pending_plugin = plugin
+        self._swap_started = time.monotonic()
+
+        with profiler.phase("plugin_setup", monitor=self.mon.get('id'), plugin=plugin_class.__name__):
+            setup_ok = plugin.setup()
+        if not setup_ok:
             print(f"Mintpaper: Failed to load plugin {plugin_class.__name__}")
-            self.plugin = None
+            # Keep whatever was showing rather than blanking the screen
+            self.pending_plugin = None
+            self._discard(plugin)
             self.window.show_all()
-        
+            if self.on_swapped:
+                self.on_swapped(self)
+            return
+
+        self.window.show_all()
+        if not plugin.is_ready:
+            self._swap_timeout_id = GLib.timeout_add(self.swap_timeout_ms, self._on_swap_timeout, plugin)
+
+    def on_plugin_ready(self, plugin):
+        """Called by a plugin (via mark_ready) once its first frame is up."""
+        if plugin is not self.pending_plugin:
+            return
+        self._complete_swap(plugin)
+
+    def _on_swap_timeout(self, plugin):
+        self._swap_timeout_id = None
+        if plugin is self.pending_plugin:
+            print(f"Mintpaper: {plugin.__class__.__name__} didn't report a first frame "
+                  f"within {self.swap_timeout_ms}ms. Swapping anyway.")
+            self._complete_swap(plugin)
+        return False
+
+    def _complete_swap(self, plugin):
+        if self._swap_timeout_id:
+            GLib.source_remove(self._swap_timeout_id)
+            self._swap_timeout_id = None
+
+        old_plugin = self.plugin
+        self.container.set_visible_child(plugin.container)
+        self.plugin = plugin
+        self.pending_plugin = None
+
+        latency_ms = (time.monotonic() - self._swap_started) * 1000
+        self.swap_latencies_ms.append(latency_ms)
+        print(f"Mintpaper: Monitor {self.mon.get('id')} swapped to {plugin.__class__.__name__} in {latency_ms:.0f}ms")
+        profiler.first_frame(self.mon.get('id'), plugin.__class__.__name__)
+
+        # The new plugin was loading while the tracker kept talking to the old one
+        for event_type, data in self._state_events.items():
+            plugin.handle_event(event_type, data)
+        plugin.update_sleep(self.is_paused)
+
+        if old_plugin:
+            self._discard(old_plugin)
+        if self.on_swapped:
+            self.on_swapped(self)
+
         # --- THE HOT-SWAP LAYER FIX ---
         # Force the window back down immediately after drawing the new wallpaper
         if self.window.get_window():
             self.window.get_window().lower()
 
+    def _discard(self, plugin):
+        plugin.teardown()
+        page = getattr(plugin, 'container', None)
+        if page is not None:
+            self.container.remove(page)
+            page.destroy()
+
+    def monitor_ids(self):
+        """Physical monitors this engine draws on; more than one in spanning mode."""
+        return self.mon.get('monitor_ids', [self.mon.get('id')])
+
+    def get_fps_limit(self, plugin=None):
+        """
+        The effective frame rate: the user's limit, clamped by the preset manifest and
+        the governor. A loading plugin passes itself, since it isn't self.plugin yet.
+        """
+        plugin = plugin or self.plugin
+        fps = self.mon.get('fps_limit', 60)
+        if plugin:
+            fps = plugin.settings.get('fps_limit', fps)
+            fps = plugin.manifest.clamp_fps(fps, self.mon.get('performance_mode', False))
+        if self.fps_cap:
+            fps = min(fps, self.fps_cap)
+        return fps
+
+    def set_fps_cap(self, cap):
+        self.fps_cap = cap
+        self.handle_event("SET_FPS", {"fps": self.get_fps_limit()})
+
+    def on_config_changed(self, entry, key, value):
+        """Config store subscriber: applies changes to this engine's entry to the live plugin."""
+        if entry is not self.mon or key not in CONFIG_EVENTS:
+            return
+        setting = next(s for s, k in SETTING_KEYS.items() if k == key)
+        for plugin in (self.plugin, self.pending_plugin):
+            if plugin:
+                plugin.settings[setting] = value
+        event_type, field = CONFIG_EVENTS[key]
+        if key == "fps_limit":
+            # Plugins get the effective rate, which may be lower than what was asked for
+            value = self.get_fps_limit()
+        self.handle_event(event_type, {field: value})
+
+    def get_stats_history(self, seconds=None):
+        if not self.stats_sampler:
+            return []
+        return self.stats_sampler.get_history(seconds)
+
+    def wants_event(self, event_type):
+        # A loading preset counts too, so its inputs are running by the time it swaps in
+        return any(p.wants_event(event_type) for p in (self.plugin, self.pending_plugin) if p)
+
     def handle_event(self, event_type, data):
+        self.event_counts[event_type] = self.event_counts.get(event_type, 0) + 1
+        with tracer.span(event_type, "event", f"Monitor {self.mon.get('id')}"):
+            self._route_event(event_type, data)
+
+    def _route_event(self, event_type, data):
+        if event_type == "SET_PAUSED":
+            self.is_paused = data.get('should_pause', False)
+        if event_type in ("SET_PAUSED", "SET_MUTED"):
+            self._state_events[event_type] = data
+        # Inputs the showing preset didn't declare never reach it (wants_event also
+        # counts the loading one, which is only for keeping the input sources running)
+        if event_type in INPUT_EVENTS.values() and self.plugin and not self.plugin.wants_event(event_type):
+            return
         if self.plugin:
-            self.plugin.handle_event(event_type, data)
\ No newline at end of file
+            self.plugin.handle_event(event_type, data)
+            if event_type == "SET_PAUSED":
+                self.plugin.update_sleep(self.is_paused)
\ No newline at end of file
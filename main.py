@@ -1,96 +1,257 @@
 import os
 import gi
-import json
 gi.require_version('Gtk', '3.0')
 gi.require_version('AyatanaAppIndicator3', '0.1')
-from gi.repository import Gtk, GLib
+from gi.repository import Gtk, Gdk, GLib
 from gi.repository import AyatanaAppIndicator3 as AppIndicator
+import argparse
 import signal
 import sys
+import time
 from pynput import mouse
-import psutil
 
 from engine.window import MintpaperEngine
-from engine.display import sync_config
+from engine.display import sync_config, build_span_monitor, get_monitor_data, merge_monitors
+from engine.config import MintpaperConfigStore
 from engine.tracker import MintpaperTracker
-from plugins.webview import WebviewPlugin
-from plugins.mp4 import Mp4Plugin
+from engine.input import MintpaperInputCoalescer
+from engine.stats import MintpaperStatsSampler
+from engine.governor import MintpaperFpsGovernor
+from engine.watchdog import MintpaperWatchdog
+from engine.control import MintpaperControlServer
+from engine.registry import default_registry
+from engine.profiler import profiler
+from engine.tracing import tracer
 from ui.editor import MintpaperEditor
 
 
+# Minutes a wallpaper stays paused before it frees its renderer (0 or None = never).
+# Off unless configured: waking shows a still and then seeks or reloads
+DEFAULT_DEEP_SLEEP = {"video": None, "webview": None}
+
+
 class MintpaperApp:
     def __init__(self):
-        self.config = sync_config()
+        # All config.json writes go through the store (debounced, atomic, off the main thread)
+        self.config_store = MintpaperConfigStore('config.json')
+        with profiler.phase("sync_config"):
+            self.config = sync_config(self.config_store)
+        profiler.metadata["engine_version"] = self.config.get("engine_version")
         self.engines = []
-        
+        self._input_sources_id = None
+
+        # Plugin modules (WebKit, libmpv) are imported only when a monitor needs them
+        with profiler.phase("plugin_registry"):
+            self.registry = default_registry()
+
+        # Spanning mode: one renderer across several monitors instead of one per monitor
+        span = build_span_monitor(self.config)
+        spanned_ids = span["monitor_ids"] if span else []
+
         for mon_data in self.config.get('monitors', []):
-            engine = MintpaperEngine(mon_data)
-            
-            file_path = mon_data.get("active_preset_path", "")
-            ext = file_path.lower().split('.')[-1] if file_path else ""
-
-            if ext == 'mp4':
-                settings = {
-                    "video_path": file_path,
-                    "muted": mon_data.get("is_muted", True),
-                    "volume": mon_data.get("volume", 50),
-                    "fps_limit": mon_data.get("fps_limit", 60)
-                }
-                engine.load_plugin(Mp4Plugin, settings)
-            elif ext == 'html':
-                settings = {
-                    "html_path": file_path,
-                    "muted": mon_data.get("is_muted", True),
-                    "volume": mon_data.get("volume", 50),
-                    "fps_limit": mon_data.get("fps_limit", 60)
-                }
-                engine.load_plugin(WebviewPlugin, settings)
-
-            self.engines.append(engine)
-
-        self.tracker = MintpaperTracker(self.engines)
-
-        GLib.timeout_add(500, self.run_tracker)
+            if mon_data["id"] in spanned_ids:
+                continue
+            self.engines.append(self._create_engine(mon_data))
+
+        if span:
+            print(f"Mintpaper: Spanning monitors {spanned_ids} with one renderer.")
+            self.engines.append(self._create_engine(span))
+
+        with profiler.phase("tracker"):
+            self.tracker = MintpaperTracker(self.engines, mode=self.config.get('tracker_mode', 'event'))
+
+            # Event mode reacts to the WM directly; polling is the fallback when it can't
+            if not self.tracker.watch_events():
+                GLib.timeout_add(500, self.run_tracker)
         
-        # NEW: Start the global mouse listener in a background thread
-        self.mouse_listener = mouse.Listener(on_move=self.on_mouse_move, on_click=self.on_mouse_click)
-        self.mouse_listener.start()
+        # Motion is coalesced to one MOUSE_MOVE per frame per monitor
+        self.input = MintpaperInputCoalescer(self.engines)
+
+        # The global mouse listener runs in a background thread, only while a preset wants it
+        self.mouse_listener = None
+
+        # System stats are sampled off the main thread and pushed only when they move
+        stats_config = self.config.get('stats', {})
+        self.stats = MintpaperStatsSampler(
+            self.engines,
+            interval=stats_config.get('interval', 2.0),
+            history_size=stats_config.get('history_size', 150),
+            deltas=stats_config.get('deltas')
+        )
+        for engine in self.engines:
+            engine.stats_sampler = self.stats
 
-        #CPU Tracker
-        psutil.cpu_percent(interval=None)
-        GLib.timeout_add_seconds(2, self.broadcast_stats)
+        # Throttles fps under CPU load / on battery; it keeps the sampler running while it can throttle something
+        self.governor = MintpaperFpsGovernor(self.engines, self.config.get('governor'))
+        self.stats.listeners.append(self.governor.on_sample)
+
+        # Reloads presets whose renderer stays over its memory/CPU budget
+        self.watchdog = MintpaperWatchdog(self.engines, self.recycle_engine, self.config.get('watchdog'))
+        self.watchdog.start()
+
+        with profiler.phase("input_sources"):
+            self.update_input_sources()
         
         # Launch the temporary UI
-        self.ui = MintpaperEditor(self)
-        self.setup_tray()
+        with profiler.phase("editor"):
+            self.ui = MintpaperEditor(self)
+        with profiler.phase("tray"):
+            self.setup_tray()
+
+        # Docking/undocking only creates or tears down the engines of affected monitors
+        self._detached_monitors = {}
+        self._hotplug_id = None
+        self.watch_monitors()
+
+        # Metrics and remote control (tools/mintpaperctl.py) over a Unix socket
+        self.control = MintpaperControlServer(self, self.config.get('control'))
+        self.control.start()
 
+        profiler.expect_first_frames([e.mon.get('id') for e in self.engines if e.plugin or e.pending_plugin])
+
+
+    def _create_engine(self, mon_data):
+        with profiler.phase("engine_window", monitor=mon_data.get('id')):
+            engine = MintpaperEngine(mon_data)
+        engine.on_swapped = self._on_engine_swapped
+        self.config_store.subscribe(engine.on_config_changed)
+        file_path = mon_data.get("active_preset_path", "")
+        if file_path:
+            self._load_into_engine(engine, file_path)
+        return engine
+
+    def _load_into_engine(self, engine, file_path):
+        with profiler.phase("plugin_import", monitor=engine.mon.get('id'), preset=file_path):
+            plugin_class = self.registry.resolve(file_path)
+        if plugin_class is None:
+            print(f"Mintpaper: No plugin registered for {file_path}")
+            return
+
+        mon_data = engine.mon
+        settings = {
+            plugin_class.path_setting: file_path,
+            "muted": mon_data.get("is_muted", True),
+            "volume": mon_data.get("volume", 50),
+            "fps_limit": mon_data.get("fps_limit", 60),
+            "webkit": self.config.get("webkit", {}),
+            "transcode": self.config.get("transcode", {}),
+            "deep_sleep": {**DEFAULT_DEEP_SLEEP, **self.config.get("deep_sleep", {})}
+        }
+        engine.load_plugin(plugin_class, settings)
+
+    def recycle_engine(self, engine, reason=None):
+        """Reloads an engine's current preset (double-buffered, so the old one shows until it's up)."""
+        file_path = engine.mon.get('active_preset_path', '')
+        if file_path:
+            print(f"Engine: Reloading {file_path} on Monitor {engine.mon.get('id')}"
+                  + (f" ({reason})" if reason else ""))
+            self._load_into_engine(engine, file_path)
 
     def load_preset_to_monitor(self, mon_idx, file_path):
         print(f"Engine: Routing {file_path} to Monitor {mon_idx}")
 
-        self.config['monitors'][mon_idx]['active_preset_path'] = file_path
-
-        with open('config.json', 'w') as f:
-            json.dump(self.config, f, indent=4)
-
-        ext = file_path.lower().split('.')[-1]
-
-        if ext == 'mp4':
-            settings = {
-                "video_path": file_path,
-                "muted": self.config['monitors'][mon_idx].get("is_muted", True),
-                "volume": self.config['monitors'][mon_idx].get("volume", 50),
-                "fps_limit": self.config['monitors'][mon_idx].get("fps_limit", 60)
-            }
-            self.engines[mon_idx].load_plugin(Mp4Plugin, settings)
-        elif ext == 'html':
-            settings = {
-                "html_path": file_path,
-                "muted": self.config['monitors'][mon_idx].get("is_muted", True),
-                "volume": self.config['monitors'][mon_idx].get("volume", 50),
-                "fps_limit": self.config['monitors'][mon_idx].get("fps_limit", 60)
-            }
-            self.engines[mon_idx].load_plugin(WebviewPlugin, settings)
+        # engine.mon is this engine's entry in self.config (a monitor, or the spanning section)
+        engine = self.engines[mon_idx]
+        self.config_store.update(engine.mon, 'active_preset_path', file_path)
+
+        self._load_into_engine(engine, file_path)
+
+        self.update_input_sources()
+
+    # --- Monitor hot-plug ---
+
+    def watch_monitors(self):
+        display = Gdk.Display.get_default()
+        if not display:
+            return
+        display.connect("monitor-added", self._on_monitor_added)
+        display.connect("monitor-removed", self._on_monitors_changed)
+        for i in range(display.get_n_monitors()):
+            display.get_monitor(i).connect("notify::geometry", self._on_monitors_changed)
+
+    def _on_monitor_added(self, display, monitor):
+        monitor.connect("notify::geometry", self._on_monitors_changed)
+        self._on_monitors_changed()
+
+    def _on_monitors_changed(self, *args):
+        # A dock fires a burst of signals; handle them as one layout change
+        if self._hotplug_id:
+            GLib.source_remove(self._hotplug_id)
+        self._hotplug_id = GLib.timeout_add(250, self._apply_monitor_layout)
+
+    def _apply_monitor_layout(self):
+        self._hotplug_id = None
+        added, removed, moved = merge_monitors(self.config, get_monitor_data(), self._detached_monitors)
+        if not (added or removed or moved):
+            return False
+
+        span = build_span_monitor(self.config)
+        spanned_ids = span["monitor_ids"] if span else []
+        wanted = [m for m in self.config['monitors'] if m["id"] not in spanned_ids]
+        if span:
+            wanted.append(span)
+
+        # Engines are keyed by their config entry, which merge_monitors keeps stable
+        current = {id(e.mon): e for e in self.engines}
+        wanted_ids = {id(m) for m in wanted}
+        for engine in self.engines:
+            if id(engine.mon) not in wanted_ids:
+                print(f"Mintpaper: {engine.mon.get('name')} is gone. Stopping its engine.")
+                self.config_store.unsubscribe(engine.on_config_changed)
+                engine.destroy()
+
+        engines = []
+        for mon_data in wanted:
+            engine = current.get(id(mon_data))
+            if engine is None:
+                print(f"Mintpaper: {mon_data.get('name')} connected. Starting an engine.")
+                engine = self._create_engine(mon_data)
+                engine.stats_sampler = self.stats
+                engine.fps_cap, _ = self.governor.cap_for(engine)
+            else:
+                if engine.apply_geometry():
+                    print(f"Mintpaper: {mon_data.get('name')} moved to {mon_data['geometry']}.")
+                # A spanned screen can move or come and go without the bounding box changing
+                if mon_data.get('monitor_rects'):
+                    engine.handle_event("SET_MONITORS", {"rects": mon_data['monitor_rects']})
+            engines.append(engine)
+
+        # Mutated in place: the tracker, input coalescer and stats sampler share this list
+        self.engines[:] = engines
+        self.tracker.refresh_monitors()
+        self.update_input_sources()
+        self.ui.refresh_monitors()
+        self.config_store.schedule_save()
+        return False
+
+    def _on_engine_swapped(self, engine):
+        # A swap (or a failed load) changes what the monitor consumes; deferred so
+        # monitors swapping together (or during startup) share one update
+        if self._input_sources_id is None:
+            self._input_sources_id = GLib.idle_add(self._update_input_sources_idle)
+
+    def _update_input_sources_idle(self):
+        self._input_sources_id = None
+        self.update_input_sources()
+        return False
+
+    def update_input_sources(self):
+        """Runs pynput and the stats sampler only while some loaded preset consumes them."""
+        needs_mouse = any(e.wants_event("MOUSE_MOVE") or e.wants_event("MOUSE_CLICK") for e in self.engines)
+        needs_stats = self.governor.needs_samples() or any(e.wants_event("SYS_STATS") for e in self.engines)
+
+        if needs_mouse and not self.mouse_listener:
+            self.mouse_listener = mouse.Listener(on_move=self.on_mouse_move, on_click=self.on_mouse_click)
+            self.mouse_listener.start()
+        elif not needs_mouse and self.mouse_listener:
+            # pynput listeners can't be restarted, so a new one is created next time
+            self.mouse_listener.stop()
+            self.mouse_listener = None
+
+        if needs_stats:
+            self.stats.start()
+        else:
+            self.stats.stop()
 
     def setup_tray(self):
 
@@ -110,6 +271,19 @@ class MintpaperApp:
         item_editor.connect("activate", self.show_editor)
         menu.append(item_editor)
 
+        item_memory = Gtk.MenuItem(label="Log Memory Report")
+        item_memory.connect("activate", self.log_memory_report)
+        menu.append(item_memory)
+
+        item_governor = Gtk.MenuItem(label="Log FPS Governor Decisions")
+        item_governor.connect("activate", self.log_governor_decisions)
+        menu.append(item_governor)
+
+        if tracer.enabled:
+            item_trace = Gtk.MenuItem(label="Export Trace")
+            item_trace.connect("activate", self.export_trace)
+            menu.append(item_trace)
+
         item_quit = Gtk.MenuItem(label="Quit Mintpaper")
         item_quit.connect("activate", self.quit)
         menu.append(item_quit)
@@ -117,50 +291,91 @@ class MintpaperApp:
         menu.show_all()
         return menu
 
+    def web_process_report(self):
+        """PID/RSS of every webview engine's web process, or None if no webview was ever created."""
+        # Importing it here would load WebKit on machines that only ever play videos
+        if "plugins.webview_context" not in sys.modules:
+            return None
+        from plugins.webview_context import MintpaperWebContext
+        if MintpaperWebContext._shared is None:
+            return None
+        return MintpaperWebContext._shared.report()
+
+    def transcode_report(self):
+        """Disk use of the video variant cache, or None if no video has asked for one."""
+        from engine.transcode import MintpaperTranscodeCache
+        if MintpaperTranscodeCache._shared is None or not MintpaperTranscodeCache._shared.enabled:
+            return None
+        return MintpaperTranscodeCache._shared.report()
+
+    def log_memory_report(self, source=None):
+        for s in self.watchdog.latest():
+            print(f"Mintpaper: Watchdog monitor {s['monitor']} ({s['plugin']}): "
+                  f"rss={s['rss_mb']} MB cpu={s['cpu_percent']}%")
+
+        variants = self.transcode_report()
+        if variants:
+            print(f"Mintpaper: Video variants {variants['disk_mb']}/{variants['budget_mb']} MB on disk, "
+                  f"{variants['variants']} files, {variants['in_use']} playing, {variants['queued']} queued")
+
+        report = self.web_process_report()
+        if report is None:
+            print("Mintpaper: No webview engines running.")
+            return
+        print(f"Mintpaper: WebKit policy={report['policy']} cache={report['cache_model']} "
+              f"total={report['total_rss_mb']} MB across {len(report['web_processes'])} web process(es)")
+        for row in report['engines']:
+            print(f"Mintpaper:   Monitor {row['monitor']}: pid={row['pid']} rss={row['rss_mb']} MB ({row['preset']})")
+        assets = report['assets']
+        if assets:
+            print(f"Mintpaper: Asset cache {assets['cached_mb']}/{assets['budget_mb']} MB, {assets['entries']} files, "
+                  f"{assets['hits']} hits, {assets['misses']} misses, {assets['not_modified']} not modified, "
+                  f"{assets['streamed']} streamed, {assets['evictions']} evictions")
+
+    def log_governor_decisions(self, source=None):
+        governor = self.governor
+        if not governor.enabled:
+            print("Mintpaper: FPS governor is disabled.")
+            return
+        print(f"Mintpaper: Governor level={governor.level_name} on_battery={governor.on_battery}")
+        for d in governor.get_decisions():
+            stamp = time.strftime('%H:%M:%S', time.localtime(d['time']))
+            print(f"Mintpaper:   {stamp} monitor {d['monitor']}: {d['fps_from']} -> {d['fps_to']} fps "
+                  f"({d['reason']}, cpu={d['cpu']}%)")
+
+    def export_trace(self, source=None):
+        tracer.report()
+        tracer.write()
+
     def show_editor(self, source):
         self.ui.show_all()
         self.ui.present()
 
     # NEW: Capture global mouse movement
     def on_mouse_move(self, x, y):
-        # Safely queue the event back onto the main GTK thread
-        GLib.idle_add(self._dispatch_mouse_events, x, y)
+        # Runs on the pynput thread; the coalescer wakes the GTK loop at most once per idle period
+        self.input.push_move(x, y)
 
 
     def on_mouse_click(self, x, y, button, pressed):
         if button == mouse.Button.left:
-            GLib.idle_add(self._dispatch_mouse_click, x, y, pressed)
+            GLib.idle_add(self._dispatch_mouse_click, x, y, pressed, time.monotonic())
 
-    def _dispatch_mouse_click(self, x, y, pressed):
+    def _dispatch_mouse_click(self, x, y, pressed, seen_at=None):
         for engine in self.engines:
-            geo = engine.mon.get('geometry')
+            if engine.is_paused or not engine.wants_event("MOUSE_CLICK"):
+                continue
 
+            geo = engine.mon.get('geometry')
             if (geo['x'] <= x <= geo['x'] + geo['w'] and geo['y'] <= y <= geo['y'] + geo['h']):
-                engine.handle_event("MOUSE_CLICK", {"clicked": pressed})
+                data = {"clicked": pressed}
+                if tracer.enabled:
+                    data["trace_id"] = tracer.begin("click", engine.mon.get('id'), at=seen_at)
+                    tracer.stamp(data["trace_id"], "main_loop")
+                engine.handle_event("MOUSE_CLICK", data)
 
-            return False
-
-    # NEW: Translate coordinates and broadcast to the router
-    def _dispatch_mouse_events(self, x, y):
-        for engine in self.engines:
-            geo = engine.mon.get('geometry')
-            
-            # Translate global OS coordinates into local monitor coordinates
-            local_x = x - geo['x']
-            local_y = y - geo['y']
-            
-            engine.handle_event("MOUSE_MOVE", {"local_x": local_x, "local_y": local_y})
-        
         # Returning False tells GLib.idle_add to run this exactly once per event
-        return False 
-
-    def broadcast_stats(self):
-        cpu = psutil.cpu_percent(interval=None)
-        ram = psutil.virtual_memory().percent
-
-        for engine in self.engines:
-            engine.handle_event("SYS_STATS", {"cpu": cpu, "ram": ram})
-        return True
+        return False
 
     def run_tracker(self):
         self.tracker.update()
@@ -168,13 +383,24 @@ class MintpaperApp:
 
     def quit(self, *args):
         # NEW: Cleanly stop the background mouse thread on exit
-        if hasattr(self, 'mouse_listener'):
+        if getattr(self, 'mouse_listener', None):
             self.mouse_listener.stop()
+        if hasattr(self, 'input'):
+            self.input.stop()
+            self.input.report()
+        if hasattr(self, 'stats'):
+            self.stats.stop()
+        if hasattr(self, 'watchdog'):
+            self.watchdog.stop()
+        if hasattr(self, 'control'):
+            self.control.stop()
+        if hasattr(self, 'config_store'):
+            self.config_store.flush()
+        if tracer.enabled:
+            self.export_trace()
             
         for engine in self.engines:
-            if engine.plugin:
-                engine.plugin.teardown()
-            engine.window.destroy()
+            engine.destroy()
         Gtk.main_quit()
         sys.exit(0)
 
@@ -185,5 +411,19 @@ class MintpaperApp:
         Gtk.main()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mintpaper Engine")
+    parser.add_argument("--profile-startup", nargs="?", const="startup_profile.json", metavar="PATH",
+                        help="write a startup timing report (JSON) once every monitor shows its first frame")
+    parser.add_argument("--trace", nargs="?", const="mintpaper_trace.json", metavar="PATH",
+                        help="trace input latency and the event/stats/tracker pipelines; written on quit (Chrome trace JSON)")
+    args = parser.parse_args()
+
+    profiler.enable_from_env()
+    if args.profile_startup:
+        profiler.enable(args.profile_startup)
+    tracer.enable_from_env()
+    if args.trace:
+        tracer.enable(args.trace)
+
     app = MintpaperApp()
     app.run()
\ No newline at end of file
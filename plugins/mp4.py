@@ -1,13 +1,20 @@
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import Gtk, GLib, GdkPixbuf
 from pathlib import Path
+import os
+import tempfile
 import mpv
+import psutil
 
 from engine.base import MintpaperPlugin, MintpaperEvents
+from engine.transcode import MintpaperTranscodeCache
 
 class Mp4Plugin(MintpaperPlugin):
-    
+    path_setting = 'video_path'
+    sleep_kind = 'video'
+
     @staticmethod
     def get_plugin_info():
         return {
@@ -26,12 +33,37 @@ class Mp4Plugin(MintpaperPlugin):
                 'slider_settings': {'lower': 0, 'upper': 100},
                 'category': 'Audio'
             },
+            {
+                'property': 'fps_limit',
+                'default': 60,
+                'control_type': 'SLIDER',
+                'settings': {'lower': 15, 'upper': 144},
+                'label': 'FPS Limit'
+            }
         ]
 
     def __init__(self, engine, settings):
         super().__init__(engine, settings)
         self.player = None
         self.video_widget = None
+        self._applied_fps = None
+
+        # Deep sleep: where playback stopped, and the still shown meanwhile
+        self._resume_pos = None
+        self._muted = None   # last SET_MUTED, re-applied to a player recreated after sleep
+
+        # libmpv runs inside our process; these are the threads this player started
+        self.thread_ids = set()
+        self._threads_before = set()
+        self._still = None
+        self._still_path = None
+
+        # Transcode cache: what mpv is playing (the original or a matched variant)
+        self.source_path = None
+        self.playing_path = None
+        self._variant_target = None     # (screen, fps) of the variant being played
+        self._requested_target = None   # (screen, fps) last asked of the cache
+        self._variant_timer = None
 
     def setup(self):
         video_path = self.settings.get('video_path', '')
@@ -43,6 +75,7 @@ class Mp4Plugin(MintpaperPlugin):
         if not file_path.is_file():
             print(f"Mintpaper: Mp4Plugin failed - File not found: {file_path}")
             return False
+        self.source_path = self.playing_path = str(file_path)
 
         # Create a blank GTK canvas to draw the video on
         self.video_widget = Gtk.DrawingArea()
@@ -51,35 +84,149 @@ class Mp4Plugin(MintpaperPlugin):
         # before we can get its window ID to pass to MPV.
         self.video_widget.connect("realize", self._on_realize)
         
-        self.engine.container.pack_start(self.video_widget, True, True, 0)
-        self.engine.window.show_all()
+        self.container.pack_start(self.video_widget, True, True, 0)
+        self.video_widget.show()
+
+        # The page may be hidden behind the current wallpaper, which means GTK
+        # won't realize it on its own; mpv needs the XID to start decoding now
+        self.video_widget.realize()
 
         return True
 
     def _on_realize(self, widget):
+        self._start_player()
+
+    def _start_player(self, resume_pos=None):
         # Grab the X11 Window ID
-        xid = widget.get_window().get_xid()
+        xid = self.video_widget.get_window().get_xid()
         
+        self._threads_before = self._current_threads()
+
         # Initialize MPV and tell it to render directly to our GTK widget's XID
         self.player = mpv.MPV(wid=str(xid), loop="inf", hwdec="auto")
+        self._applied_fps = None
+
+        if resume_pos:
+            # Back from deep sleep: jump to where we stopped as soon as the file is open.
+            # Only once; a later switch to a variant brings its own start position.
+            pending_seek = [resume_pos]
+
+            @self.player.event_callback('file-loaded')
+            def _on_loaded(event):
+                if pending_seek:
+                    GLib.idle_add(self._seek_to, pending_seek.pop())
+
+        # playback-restart fires once the first frame of the file is decoded and shown.
+        # mpv calls back on its own event thread, so hop to the GTK loop.
+        @self.player.event_callback('playback-restart')
+        def _on_first_frame(event):
+            GLib.idle_add(self.mark_ready)
+            # The source frame rate is only known once the file is open
+            GLib.idle_add(self._apply_fps_limit)
+            GLib.idle_add(self._claim_threads)
+            GLib.idle_add(self._request_variant)
         
         # Apply initial settings
-        self.player.mute = self.settings.get('muted', True)
+        self.player.mute = self._muted if self._muted is not None else self.settings.get('muted', True)
         self.player.volume = self.settings.get('volume', 50)
         
-        # Start playback
-        file_path = Path(self.settings.get('video_path', '')).absolute()
-        self.player.play(str(file_path))
+        # Start playback (a cached variant, if one has been switched to)
+        self.player.play(self.playing_path)
+
+    def _current_threads(self):
+        try:
+            return {t.id for t in psutil.Process().threads()}
+        except psutil.Error:
+            return set()
+
+    def _claim_threads(self):
+        """
+        Threads that appeared since this player was created (demuxer, decoder, vo...).
+        Another player starting at the same moment could be miscounted, so this is an estimate.
+        """
+        if self.player and not self.thread_ids:
+            self.thread_ids = self._current_threads() - self._threads_before
+        return False
+
+    def resource_owner(self):
+        return {"tids": self.thread_ids} if self.player and self.thread_ids else None
+
+    def _seek_to(self, position):
+        if self.player:
+            self.player.seek(position, reference='absolute')
+        return False
 
     def teardown(self):
+        super().teardown()
+        if self._variant_timer:
+            GLib.source_remove(self._variant_timer)
+            self._variant_timer = None
+        self._switch_to(None)
         if self.player:
             self.player.terminate()
             self.player = None
         if self.video_widget:
             self.video_widget.destroy()
             self.video_widget = None
+        self._drop_still()
+
+    # --- Deep sleep ---
+
+    def sleep(self):
+        if not self.player:
+            return False
+
+        self._resume_pos = self.player.time_pos
+        fd, self._still_path = tempfile.mkstemp(prefix="mintpaper-still-", suffix=".png")
+        os.close(fd)
+        try:
+            self.player.screenshot_to_file(self._still_path, includes='video')
+        except Exception as e:
+            print(f"Mintpaper: Couldn't capture a still for deep sleep ({e})")
+            self._drop_still()
+            return False
+
+        self.player.terminate()
+        self.player = None
+        self.thread_ids = set()
+
+        # mpv drew straight into the DrawingArea's X window, so the still replaces it
+        alloc = self.container.get_allocation()
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(self._still_path, alloc.width, alloc.height, False)
+            self._still = Gtk.Image.new_from_pixbuf(pixbuf)
+        except GLib.Error:
+            self._still = Gtk.Image()
+        self.video_widget.hide()
+        self.container.pack_start(self._still, True, True, 0)
+        self._still.show()
+        return True
+
+    def wake(self):
+        self._drop_still()
+        self.video_widget.show()
+        self._start_player(self._resume_pos)
+
+    def _drop_still(self):
+        if self._still:
+            self._still.destroy()
+            self._still = None
+        if self._still_path:
+            try:
+                os.unlink(self._still_path)
+            except OSError:
+                pass
+            self._still_path = None
+
+    def wants_event(self, event_type):
+        # Videos don't react to the pointer or system stats
+        return event_type not in ("MOUSE_MOVE", "MOUSE_CLICK", "SYS_STATS")
 
     def handle_event(self, event_type, data):
+        if event_type == MintpaperEvents.SET_MUTED:
+            # Remembered even while asleep, so the recreated player starts in sync
+            self._muted = data.get('should_mute', True)
+
         # If the player hasn't initialized yet, drop the event
         if not self.player:
             return
@@ -87,6 +234,101 @@ class Mp4Plugin(MintpaperPlugin):
         if event_type == MintpaperEvents.SET_PAUSED:
             self.player.pause = data.get('should_pause', False)
         elif event_type == MintpaperEvents.SET_MUTED:
-            self.player.mute = data.get('should_mute', True)
+            self.player.mute = self._muted
         elif event_type == "SET_VOLUME":
-            self.player.volume = data.get('volume', 50)
\ No newline at end of file
+            self.player.volume = data.get('volume', 50)
+        elif event_type == "SET_FPS":
+            self._apply_fps_limit()
+            self._schedule_variant()
+
+    def _apply_fps_limit(self):
+        """
+        Caps the rendered frame rate with a labelled fps filter, swapped live.
+        Frames are dropped before they reach the renderer; a limit at or above
+        the video's own rate removes the filter so playback stays untouched.
+        """
+        if not self.player:
+            return False
+
+        fps = self.engine.get_fps_limit(self)
+        source_fps = self.player.container_fps
+        if source_fps and fps >= source_fps:
+            fps = None
+        if fps == self._applied_fps:
+            return False
+
+        try:
+            if self._applied_fps:
+                self.player.command('vf', 'remove', '@mintpaper-fps')
+            if fps:
+                self.player.command('vf', 'add', f'@mintpaper-fps:fps=fps={fps}')
+        except Exception as e:
+            print(f"Mintpaper: Couldn't cap video at {fps} fps ({e})")
+            return False
+
+        self._applied_fps = fps
+        return False
+    # --- Matched variants ---
+
+    def _variant_wanted(self):
+        """(screen size in device pixels, fps) a variant for this monitor should have."""
+        geo = self.engine.mon.get('geometry', {})
+        scale = self.engine.mon.get('scale_factor', 1) or 1
+        fps = self.manifest.clamp_fps(self.settings.get('fps_limit', 60),
+                                      self.engine.mon.get('performance_mode', False))
+        # The governor's cap is left out on purpose: it comes and goes, a variant takes minutes
+        return (geo.get('w', 1920) * scale, geo.get('h', 1080) * scale), fps
+
+    def _schedule_variant(self):
+        # A slider drag sends a SET_FPS per step; only transcode for where it settles
+        if self._variant_timer:
+            GLib.source_remove(self._variant_timer)
+        self._variant_timer = GLib.timeout_add_seconds(3, self._request_variant)
+
+    def _request_variant(self):
+        self._variant_timer = None
+        cache = MintpaperTranscodeCache.get(self.settings.get('transcode'))
+        if not cache.enabled or not self.source_path:
+            return False
+
+        target = self._variant_wanted()
+        if target == self._requested_target:
+            return False
+        self._requested_target = target
+
+        # The fps filter can lower a variant's rate but not raise it back
+        if self._variant_target and target[1] > self._variant_target[1]:
+            self._switch_to(self.source_path)
+
+        cache.request(self.source_path, target[0], target[1],
+                      lambda path: self._on_variant(path, target))
+        return False
+
+    def _on_variant(self, path, target):
+        if self.video_widget is None or target != self._requested_target:
+            return False
+        self._switch_to(path or self.source_path, target if path else None)
+        return False
+
+    def _switch_to(self, path, target=None):
+        """Moves playback to another file at the same position. None just releases the variant."""
+        cache = MintpaperTranscodeCache._shared
+        if path == self.playing_path:
+            return
+        if cache and self.playing_path != self.source_path:
+            cache.release(self.playing_path)
+        if path is None:
+            return
+
+        self.playing_path = path
+        self._variant_target = target
+        if path != self.source_path:
+            cache.acquire(path)
+            print(f"Mintpaper: Monitor {self.engine.mon.get('id')} switched to variant {os.path.basename(path)}")
+
+        if self.player:
+            position = self.player.time_pos
+            if position:
+                self.player.loadfile(path, start=f"{position:.3f}")
+            else:
+                self.player.loadfile(path)
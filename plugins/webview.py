@@ -4,11 +4,19 @@ gi.require_version('WebKit2', '4.1')
 from gi.repository import Gtk, GLib, Gdk, WebKit2
 from pathlib import Path
 import json
+import psutil
 
 from engine.base import MintpaperPlugin, MintpaperEvents
+from engine.tracing import tracer
+from plugins.webview_context import MintpaperWebContext
+
+# The bridge runtime is injected once per page load instead of being rebuilt per event
+BRIDGE_SCRIPT = Path(__file__).with_name('webview_bridge.js').read_text()
 
 class WebviewPlugin(MintpaperPlugin):
-    
+    path_setting = 'html_path'
+    sleep_kind = 'webview'
+
     @staticmethod
     def get_plugin_info():
         return {
@@ -40,6 +48,21 @@ class WebviewPlugin(MintpaperPlugin):
     def __init__(self, engine, settings):
         super().__init__(engine, settings)
         self.webview = None
+        self.web_context = None
+        self.content_manager = None
+        self.is_paused = False
+        self._muted = None   # last SET_MUTED, re-applied to a view rebuilt after hibernation
+
+        # Messages wait here until the next flush; one run_javascript per batch
+        self._outbox = []
+        self._flush_pending = False
+        self._bridge_ready = False
+
+        # Hibernation: a snapshot stands in while the view (and its web process share) is gone
+        self._still = None
+        self._saved_state = None
+        self._hibernate = None      # {"snapshot": bool, "state": bool, "timeout": source id} while going down
+        self._hibernated_pid = None
 
     def setup(self):
         # Using self.settings to avoid the scoping bug from the fork
@@ -53,8 +76,26 @@ class WebviewPlugin(MintpaperPlugin):
             print(f"Mintpaper: WebviewPlugin failed - File not found: {file_path}")
             return False
 
-        self.webview = WebKit2.WebView()
+        self._build_view()
+        self.webview.show()
+        return True
+
+    def _build_view(self):
+        self.content_manager = WebKit2.UserContentManager()
+        self.content_manager.add_script(WebKit2.UserScript.new(
+            BRIDGE_SCRIPT,
+            WebKit2.UserContentInjectedFrames.TOP_FRAME,
+            WebKit2.UserScriptInjectionTime.START,
+            None, None
+        ))
+        self.content_manager.connect("script-message-received::mintpaper", self._on_script_message)
+        self.content_manager.register_script_message_handler("mintpaper")
+
+        # Every monitor shares one WebContext (and, by default, one web process)
+        self.web_context = MintpaperWebContext.get(self.settings.get('webkit'))
+        self.webview = self.web_context.create_view(self.engine, self.content_manager)
         self.webview.set_background_color(Gdk.RGBA(0, 0, 0, 0))
+        self.webview.connect("load-changed", self._on_load_changed)
         
         webview_settings = self.webview.get_settings()
         webview_settings.set_allow_file_access_from_file_urls(True)
@@ -62,29 +103,38 @@ class WebviewPlugin(MintpaperPlugin):
         webview_settings.set_media_playback_allows_inline(True)
         webview_settings.set_media_playback_requires_user_gesture(False)
         
-        self.engine.container.pack_start(self.webview, True, True, 0)
-        self.engine.window.show_all()
+        self.container.pack_start(self.webview, True, True, 0)
 
         # Apply initial audio state
-        self.webview.set_is_muted(self.settings.get('muted', True))
+        self.webview.set_is_muted(self._muted if self._muted is not None else self.settings.get('muted', True))
         
-        # Load the local file
-        self.webview.load_uri(file_path.as_uri())
+        # Load the local file. Initial JS parameters go out when the page reports ready.
+        self.webview.load_uri(self.web_context.uri_for(self.settings.get('html_path', '')))
 
-        # Apply initial JS parameters once loaded
-        fps_limit = self.settings.get('fps_limit', 60)
-        volume = self.settings.get('volume', 50)
-        init_script = f"if(window.setFPS) {{ setFPS({fps_limit}); if(window.updateVolume) {{ updateVolume({volume}); }}}}"
-        GLib.timeout_add(1000, lambda: self.webview.run_javascript(init_script, None, None, None))
-
-        return True
-
-    def teardown(self):
+    def _destroy_view(self):
+        if self.content_manager:
+            self.content_manager.unregister_script_message_handler("mintpaper")
+            self.content_manager = None
         if self.webview:
+            self.web_context.release_view(self.webview)
             self.webview.destroy()
             self.webview = None
+        self._outbox.clear()
+        self._bridge_ready = False
+
+    def teardown(self):
+        super().teardown()
+        self._cancel_hibernate()
+        self._destroy_view()
+        self._drop_still()
 
     def handle_event(self, event_type, data):
+        # Remembered even while hibernated, so the rebuilt page starts in sync
+        if event_type == MintpaperEvents.SET_PAUSED:
+            self.is_paused = data.get('should_pause', False)
+        elif event_type == MintpaperEvents.SET_MUTED:
+            self._muted = data.get('should_mute', True)
+
         # The central router for all incoming engine commands
         if not self.webview:
             return
@@ -95,6 +145,10 @@ class WebviewPlugin(MintpaperPlugin):
             self._set_muted(data.get('should_mute', True))
         elif event_type == "SET_VOLUME":
             self._set_volume(data.get('volume', 0))
+        elif event_type == "SET_FPS":
+            self._post('fps', {"fps": self.engine.get_fps_limit(self)})
+        elif event_type == "SET_MONITORS":
+            self._post('monitors', {"rects": data.get('rects', [])})
         elif event_type == "MOUSE_MOVE":
             self._on_mouse_move(data)
         elif event_type == "MOUSE_CLICK":
@@ -102,89 +156,213 @@ class WebviewPlugin(MintpaperPlugin):
         elif event_type == "SYS_STATS":
             self._update_system_stats(data)
 
+    # --- JS Bridge ---
+
+    def _on_load_changed(self, webview, load_event):
+        # A new document means a fresh bridge runtime that hasn't said hello yet
+        if load_event == WebKit2.LoadEvent.STARTED:
+            self._bridge_ready = False
+        elif load_event == WebKit2.LoadEvent.FINISHED:
+            if self._still:
+                # Back from hibernation: the page has restored itself, swap out the snapshot
+                self._drop_still()
+                self.webview.show()
+            self.mark_ready()
+
+    def _on_script_message(self, content_manager, js_result):
+        try:
+            message = json.loads(js_result.get_js_value().to_string())
+        except (TypeError, ValueError):
+            return
+
+        if message.get('type') == 'ready':
+            self._bridge_ready = True
+            # Replay the current state so a (re)loaded page starts in sync
+            self._post('fps', {"fps": self.engine.get_fps_limit(self)})
+            if self.engine.mon.get('monitor_rects'):
+                self._post('monitors', {"rects": self.engine.mon['monitor_rects']})
+            self._post('volume', {"volume": self.settings.get('volume', 50)})
+            if self._saved_state is not None:
+                self._post('restore_state', {"state": self._saved_state})
+                self._saved_state = None
+            if self.is_paused:
+                self._post('pause', {"paused": True, "native": self.manifest.native_pause})
+            # Stats only arrive on change, so hand a fresh page the latest sample now
+            latest = self.engine.get_stats_history()[-1:]
+            if latest and self.engine.wants_event("SYS_STATS"):
+                self._post('stats', latest[0])
+            self._schedule_flush()
+        elif message.get('type') == 'state':
+            if self._hibernate:
+                self._saved_state = message.get('state')
+                self._hibernate["state"] = True
+                self._finish_hibernate()
+        elif message.get('type') == 'trace':
+            # Page-side stamps are epoch milliseconds from the web process
+            at = tracer.from_wall(message.get('at', 0) / 1000)
+            if message.get('stage') == 'frame':
+                tracer.finish(message.get('id'), 'frame', at)
+            else:
+                tracer.stamp(message.get('id'), message.get('stage'), at)
+        elif message.get('type') == 'stats_history':
+            samples = self.engine.get_stats_history(message.get('seconds'))
+            self._post('stats_history', {"samples": samples})
+
+    def _post(self, kind, data, coalesce=True):
+        """Queues a bridge message. State-like messages replace their older queued copy."""
+        if coalesce:
+            for entry in self._outbox:
+                if entry[0] == kind:
+                    if tracer.enabled:
+                        tracer.drop(entry[1].get('trace'))
+                    entry[1] = data
+                    break
+            else:
+                self._outbox.append([kind, data])
+        else:
+            self._outbox.append([kind, data])
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._bridge_ready and self._outbox and not self._flush_pending:
+            self._flush_pending = True
+            GLib.idle_add(self._flush_outbox)
+
+    def _flush_outbox(self):
+        self._flush_pending = False
+        if not self.webview or not self._bridge_ready or not self._outbox:
+            return False
+
+        if tracer.enabled:
+            for _, data in self._outbox:
+                tracer.stamp(data.get('trace'), 'run_javascript')
+        batch = json.dumps(self._outbox)
+        self._outbox = []
+        self.webview.run_javascript(f"window.__mintpaper && window.__mintpaper.dispatch({batch});", None, None, None)
+        return False
+
+    # --- Hibernation (deep sleep) ---
+
+    def sleep(self):
+        if not self.webview or not self._bridge_ready or self._hibernate:
+            return False
+
+        # Ask the page for its state and grab the current frame; the view goes once both are in
+        self._saved_state = None
+        self._hibernated_pid = self.web_context.pid_for(self.webview)
+        self._hibernate = {"snapshot": False, "state": False, "timeout": None}
+        # Presets without saveWallpaperState answer immediately; this only guards a hung page
+        self._hibernate["timeout"] = GLib.timeout_add(1000, self._on_state_timeout)
+        self._post('save_state', {})
+        self.webview.get_snapshot(WebKit2.SnapshotRegion.VISIBLE, WebKit2.SnapshotOptions.NONE,
+                                  None, self._on_snapshot)
+        return True
+
+    def _on_snapshot(self, webview, result):
+        if not self._hibernate or webview is not self.webview:
+            return
+        try:
+            surface = webview.get_snapshot_finish(result)
+            self._still = Gtk.Image.new_from_surface(surface)
+        except GLib.Error as e:
+            print(f"Mintpaper: Webview snapshot failed ({e}). Hibernating without a still.")
+            self._still = Gtk.Image()
+        self._hibernate["snapshot"] = True
+        self._finish_hibernate()
+
+    def _on_state_timeout(self):
+        if self._hibernate:
+            self._hibernate["timeout"] = None
+            self._hibernate["state"] = True
+            self._finish_hibernate()
+        return False
+
+    def _finish_hibernate(self):
+        if not (self._hibernate["snapshot"] and self._hibernate["state"]):
+            return
+        self._cancel_hibernate()
+
+        self.container.pack_start(self._still, True, True, 0)
+        self._still.show()
+        self._destroy_view()
+
+    def _cancel_hibernate(self):
+        if self._hibernate and self._hibernate["timeout"]:
+            GLib.source_remove(self._hibernate["timeout"])
+        self._hibernate = None
+
+    def wake(self):
+        if self._hibernate:
+            # Uncovered before the view was gone: nothing to rebuild
+            self._cancel_hibernate()
+            self._saved_state = None
+            self._drop_still()
+            return
+
+        # The snapshot stays up until the reloaded page has finished loading
+        self._build_view()
+
+    def _drop_still(self):
+        if self._still:
+            self._still.destroy()
+            self._still = None
+
+    def resource_owner(self):
+        pid = self.web_context.pid_for(self.webview) if self.webview else None
+        return {"pid": pid} if pid else None
+
+    def memory_mb(self):
+        """Our process plus this view's web process (shared with other webviews under the "shared" policy)."""
+        total = super().memory_mb() or 0
+        pid = self.web_context.pid_for(self.webview) if self.webview else self._hibernated_pid
+        if pid:
+            try:
+                total += psutil.Process(pid).memory_info().rss / (1024 * 1024)
+            except psutil.Error:
+                pass
+        return total
+
     # --- Internal Event Handlers ---
 
     def _set_paused(self, should_pause):
         # 1. Native WebKit Rendering Pause (if supported)
-
         self.is_paused = should_pause
 
         if hasattr(self.webview, 'set_is_paused'):
             self.webview.set_is_paused(should_pause)
 
-        # 2. The Coma Script: Hijack with Callback Recovery
-        val = "true" if should_pause else "false"
-        script = f"""
-        (function() {{
-            // Wrap requestAnimationFrame on first run to capture callbacks while paused
-            if (window._mp_controlled === undefined) {{
-                window._mp_raf = window.requestAnimationFrame;
-                window._mp_is_paused = false;
-                window._mp_pending_callbacks = new Set();
-                window._mp_controlled = true;
-
-                window.requestAnimationFrame = function(callback) {{
-                    if (window._mp_is_paused) {{
-                        window._mp_pending_callbacks.add(callback);
-                        return 0;
-                    }}
-                    return window._mp_raf(callback);
-                }};
-            }}
-
-            window._mp_is_paused = {val};
-
-            if ({val}) {{
-                // PAUSE: Pause CSS animations and media elements
-                document.body.style.animationPlayState = 'paused';
-                document.querySelectorAll('video, audio').forEach(m => m.pause());
-            }} else {{
-                // RESUME: Resume CSS animations and media elements
-                document.body.style.animationPlayState = 'running';
-                document.querySelectorAll('video, audio').forEach(m => m.play());
-
-                // Restart any animation loops captured during the pause state
-                const pending = Array.from(window._mp_pending_callbacks);
-                window._mp_pending_callbacks.clear();
-                pending.forEach(cb => window._mp_raf(cb));
-            }}
-            
-            // Dispatch standard event for custom wallpaper hooks
-            window.dispatchEvent(new CustomEvent('wallpaperPause', {{ detail: {val} }}));
-        }})();
-        """
-        self.webview.run_javascript(script, None, None, None)
+        # 2. The Coma Script lives in the bridge runtime; presets with native pausing handle it themselves
+        self._post('pause', {"paused": should_pause, "native": self.manifest.native_pause})
 
     def _set_muted(self, should_mute):
         self.webview.set_is_muted(should_mute)
 
     def _set_volume(self, volume):
-        script = f"if(window.updateVolume) {{ updateVolume({volume}); }}"
-        GLib.idle_add(self.webview.run_javascript, script, None, None, None)
+        self._post('volume', {"volume": volume})
 
     def _on_mouse_move(self, data):
-
-        if getattr(self, 'is_paused', False):
+        if self.is_paused:
             return
 
-        local_x = data.get('local_x', 0)
-        local_y = data.get('local_y', 0)
-        script = f"if(window.updateMouse) {{ window.updateMouse({local_x}, {local_y}); }}"
-        GLib.idle_add(self.webview.run_javascript, script, None, None, None)
+        message = {"x": data.get('local_x', 0), "y": data.get('local_y', 0)}
+        if data.get('trace_id'):
+            message["trace"] = data['trace_id']
+            tracer.stamp(data['trace_id'], 'dispatch')
+        self._post('mouse', message)
 
     def _on_mouse_click(self, data):
-
-        if getattr(self, 'is_paused', False):
+        if self.is_paused:
             return
 
-        val = "true" if data.get('clicked') else "false"
-        script = f"if(window.updateClick) {{ window.updateClick({val}); }}"
-        GLib.idle_add(self.webview.run_javascript, script, None, None, None)
+        # Press and release must both arrive, so clicks are never coalesced
+        message = {"pressed": bool(data.get('clicked'))}
+        if data.get('trace_id'):
+            message["trace"] = data['trace_id']
+            tracer.stamp(data['trace_id'], 'dispatch')
+        self._post('click', message, coalesce=False)
 
     def _update_system_stats(self, data):
-        if getattr(self,'is_paused', False):
+        if self.is_paused:
             return
 
-        payload = json.dumps(data)
-        script = f"if(window.updateStats) {{ window.updateStats({payload}); }}"
-        GLib.idle_add(self.webview.run_javascript, script, None, None, None)
\ No newline at end of file
+        self._post('stats', data)
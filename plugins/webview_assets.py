@@ -0,0 +1,194 @@
+import mimetypes
+import os
+from collections import OrderedDict
+from urllib.parse import quote, unquote, urlsplit
+
+import gi
+gi.require_version('WebKit2', '4.1')
+gi.require_version('Soup', '3.0')
+from gi.repository import Gio, GLib, Soup, WebKit2
+
+SCHEME = "mintpaper"
+HOST = "preset"
+# Presets inside a folder with this name may read anything in it (e.g. shared ../common assets)
+PRESETS_DIR = "presets"
+
+# Types Python's table doesn't know (or guesses differently than browsers expect)
+EXTRA_TYPES = {
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".wasm": "application/wasm",
+    ".mjs": "text/javascript",
+    ".js": "text/javascript",
+    ".woff2": "font/woff2",
+    ".json": "application/json",
+}
+
+
+class MintpaperAssetServer:
+    """
+    Serves preset files to every webview from one in-process LRU cache, so
+    monitors showing the same preset (and hot swaps back to it) don't go to
+    disk again. Files are read once into GLib.Bytes, which every request then
+    streams from. Entries are revalidated against the file's mtime and size
+    on each request, and WebKit's own copy is confirmed with a 304.
+    """
+
+    def __init__(self, budget_mb=64, max_entry_fraction=0.25):
+        self.budget = int(budget_mb * 1024 * 1024)
+        # Anything bigger than this (videos, music) is streamed from disk instead
+        self.max_entry = int(self.budget * max_entry_fraction)
+        self._cache = OrderedDict()     # path -> (stamp, GLib.Bytes, mime)
+        self.cached_bytes = 0
+        self.roots = set()              # folders pages may read from
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0, "streamed": 0, "evictions": 0,
+                         "errors": 0, "bytes_served": 0}
+
+    # --- URIs ---
+
+    def allow(self, folder):
+        self.roots.add(os.path.abspath(folder))
+
+    def uri_for(self, file_path):
+        """mintpaper://preset/<absolute path>; relative URLs inside the page resolve against it."""
+        path = os.path.abspath(file_path)
+        self.allow(self._root_for(path))
+        return f"{SCHEME}://{HOST}{quote(path)}"
+
+    def _root_for(self, path):
+        """The presets/ folder holding the preset, or just its own folder for presets kept elsewhere."""
+        folder = os.path.dirname(path)
+        parent = folder
+        while os.path.basename(parent) != PRESETS_DIR:
+            if os.path.dirname(parent) == parent:
+                return folder
+            parent = os.path.dirname(parent)
+        return parent
+
+    def _path_for(self, uri):
+        path = os.path.abspath(unquote(urlsplit(uri).path))
+        if not any(path == root or path.startswith(root + os.sep) for root in self.roots):
+            return None
+        return path
+
+    # --- WebKit callback (GTK main thread) ---
+
+    def handle_request(self, request):
+        path = self._path_for(request.get_uri())
+        if path is None:
+            self._fail(request, Gio.IOErrorEnum.PERMISSION_DENIED, "Outside the preset folder")
+            return
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._fail(request, Gio.IOErrorEnum.NOT_FOUND, "File not found")
+            return
+
+        mime = self._mime_type(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._not_modified(request, stamp):
+            self.counters["not_modified"] += 1
+            self._respond(request, Gio.MemoryInputStream.new(), 0, mime, stamp, status=304)
+            return
+
+        if st.st_size > self.max_entry:
+            self.counters["streamed"] += 1
+            try:
+                stream = Gio.File.new_for_path(path).read(None)
+            except GLib.Error:
+                self._fail(request, Gio.IOErrorEnum.FAILED, "Read failed")
+                return
+            self._respond(request, stream, st.st_size, mime, stamp)
+            self.counters["bytes_served"] += st.st_size
+            return
+
+        entry = self._cache.get(path)
+        if entry and entry[0] == stamp:
+            self.counters["hits"] += 1
+            self._cache.move_to_end(path)
+        else:
+            self.counters["misses"] += 1
+            try:
+                entry = (stamp, self._read(path, st.st_size), mime)
+            except OSError:
+                self._fail(request, Gio.IOErrorEnum.FAILED, "Read failed")
+                return
+            self._store(path, entry)
+
+        data = entry[1]
+        self.counters["bytes_served"] += data.get_size()
+        stream = Gio.MemoryInputStream.new_from_bytes(data)
+        self._respond(request, stream, data.get_size(), mime, stamp)
+
+    def _read(self, path, size):
+        if size == 0:
+            return GLib.Bytes.new(b"")
+        with open(path, 'rb') as f:
+            return GLib.Bytes.new(f.read())
+
+    def _store(self, path, entry):
+        old = self._cache.pop(path, None)
+        if old:
+            self.cached_bytes -= old[1].get_size()
+        self._cache[path] = entry
+        self.cached_bytes += entry[1].get_size()
+        while self.cached_bytes > self.budget and self._cache:
+            _, (_, evicted, _) = self._cache.popitem(last=False)
+            self.cached_bytes -= evicted.get_size()
+            self.counters["evictions"] += 1
+
+    def _mime_type(self, path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext in EXTRA_TYPES:
+            return EXTRA_TYPES[ext]
+        mime, _ = mimetypes.guess_type(path)
+        return mime or "application/octet-stream"
+
+    def _etag(self, stamp):
+        return f'"{stamp[0]:x}-{stamp[1]:x}"'
+
+    def _not_modified(self, request, stamp):
+        # WebKitGTK < 2.36 can neither show us request headers nor send a status
+        if not hasattr(WebKit2, "URISchemeResponse") or not hasattr(request, "get_http_headers"):
+            return False
+        headers = request.get_http_headers()
+        value = headers.get_one("If-None-Match") if headers else None
+        if not value:
+            return False
+        etag = self._etag(stamp)
+        return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in value.split(","))
+
+    def _respond(self, request, stream, length, mime, stamp, status=None):
+        if not hasattr(WebKit2, "URISchemeResponse"):
+            # WebKitGTK < 2.36 can't set headers
+            request.finish(stream, length, mime)
+            return
+
+        response = WebKit2.URISchemeResponse.new(stream, length)
+        response.set_content_type(mime)
+        if status == 304:
+            response.set_status(304, "Not Modified")
+        headers = Soup.MessageHeaders.new(Soup.MessageHeadersType.RESPONSE)
+        # WebKit checks back with us before reusing a copy, so edits to a preset show up on reload
+        headers.append("Cache-Control", "no-cache")
+        headers.append("ETag", self._etag(stamp))
+        headers.append("Access-Control-Allow-Origin", "*")
+        response.set_http_headers(headers)
+        request.finish_with_response(response)
+
+    def _fail(self, request, code, message):
+        self.counters["errors"] += 1
+        request.finish_error(GLib.Error.new_literal(Gio.io_error_quark(), message, int(code)))
+
+    # --- Stats ---
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._cache),
+            "cached_mb": round(self.cached_bytes / (1024 * 1024), 2),
+            "budget_mb": round(self.budget / (1024 * 1024), 2),
+        }
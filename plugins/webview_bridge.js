@@ -0,0 +1,174 @@
+// Mintpaper bridge runtime.
+// Injected once per page at document start by WebviewPlugin through a
+// WebKit2.UserScript. Python talks to it with one batched call per frame:
+//     window.__mintpaper.dispatch([["mouse", {...}], ["stats", {...}], ...])
+// and the page talks back through the "mintpaper" script message handler.
+(function () {
+    if (window.__mintpaper) return;
+
+    function post(message) {
+        try {
+            window.webkit.messageHandlers.mintpaper.postMessage(JSON.stringify(message));
+        } catch (e) {
+            // Handler not registered (page opened outside the engine)
+        }
+    }
+
+    // --- Frame pacing: every rAF goes through one scheduler so the engine can
+    // cap the frame rate without the preset's help, and park callbacks while paused ---
+    const nativeRaf = window.requestAnimationFrame.bind(window);
+    const queued = new Map();   // id -> callback, in request order
+    let nextId = 1;
+    let tickScheduled = false;
+    let frameInterval = 0;      // ms between frames, 0 = display rate
+    let lastFrame = 0;
+    let paused = false;
+
+    function schedule() {
+        if (tickScheduled || paused || queued.size === 0) return;
+        tickScheduled = true;
+        nativeRaf(tick);
+    }
+
+    function tick(now) {
+        tickScheduled = false;
+        if (paused) return;
+
+        // Skip display refreshes until a whole frame interval has passed (1ms of vsync jitter allowed)
+        if (frameInterval && lastFrame && now - lastFrame < frameInterval - 1) {
+            schedule();
+            return;
+        }
+        // Stay on the cadence instead of drifting by a refresh every frame
+        lastFrame = frameInterval && lastFrame ? now - ((now - lastFrame) % frameInterval) : now;
+
+        const batch = Array.from(queued.values());
+        queued.clear();
+        window.__mintpaper.frames++;
+        for (const callback of batch) {
+            try {
+                callback(now);
+            } catch (e) {
+                console.error(e);
+            }
+        }
+    }
+
+    window.requestAnimationFrame = function (callback) {
+        const id = nextId++;
+        queued.set(id, callback);
+        schedule();
+        return id;
+    };
+
+    window.cancelAnimationFrame = function (id) {
+        queued.delete(id);
+    };
+
+    function setFrameRate(fps) {
+        frameInterval = fps > 0 ? 1000 / fps : 0;
+        window.__mintpaper.fps = fps;
+        // Not forwarded to window.setFPS: a second limiter in the page, without the
+        // jitter allowance above, would drop frames this one lets through
+        window.dispatchEvent(new CustomEvent('wallpaperFps', { detail: fps }));
+    }
+
+    // --- The Coma Script ---
+    function setPaused(value, native) {
+        if (value === paused) return;
+        paused = value;
+
+        // Presets whose manifest declares native_pause stop their own loops
+        if (native && window.setPlaybackPaused) {
+            window.setPlaybackPaused(paused);
+        } else {
+            if (document.body) {
+                // Pause/resume CSS animations
+                document.body.style.animationPlayState = paused ? 'paused' : 'running';
+            }
+            document.querySelectorAll('video, audio').forEach(m => paused ? m.pause() : m.play());
+        }
+
+        // Restart any animation loops captured during the pause state. This has to run
+        // for native_pause presets too: their rAF callbacks are parked here all the same
+        if (!paused) {
+            lastFrame = 0;
+            schedule();
+        }
+
+        // Dispatch standard event for custom wallpaper hooks
+        window.dispatchEvent(new CustomEvent('wallpaperPause', { detail: paused }));
+    }
+
+    // --- Latency tracing (only when the engine runs with --trace) ---
+    function traceAck(id) {
+        post({ type: 'trace', id: id, stage: 'page', at: performance.timeOrigin + performance.now() });
+        // The next animation frame is the earliest the update can be on screen
+        window.requestAnimationFrame(() => {
+            post({ type: 'trace', id: id, stage: 'frame', at: performance.timeOrigin + performance.now() });
+        });
+    }
+
+    // --- Message handlers: each maps to the preset API documented in the README ---
+    const handlers = {
+        mouse: d => {
+            if (window.updateMouse) window.updateMouse(d.x, d.y);
+            if (d.trace) traceAck(d.trace);
+        },
+        click: d => {
+            if (window.updateClick) window.updateClick(d.pressed);
+            if (d.trace) traceAck(d.trace);
+        },
+        stats: d => window.updateStats && window.updateStats(d),
+        stats_history: d => window.updateStatsHistory && window.updateStatsHistory(d.samples),
+        volume: d => window.updateVolume && window.updateVolume(d.volume),
+        fps: d => setFrameRate(d.fps),
+        pause: d => setPaused(d.paused, d.native),
+        // Hibernation: the page is about to be destroyed, and later reloaded with this state
+        save_state: () => {
+            let state = null;
+            try {
+                state = window.saveWallpaperState ? window.saveWallpaperState() : null;
+            } finally {
+                post({ type: 'state', state: state === undefined ? null : state });
+            }
+        },
+        restore_state: d => window.restoreWallpaperState && window.restoreWallpaperState(d.state),
+        monitors: d => {
+            window.__mintpaper.monitors = d.rects;
+            if (window.setMonitorRects) window.setMonitorRects(d.rects);
+        },
+    };
+
+    window.__mintpaper = {
+        // Spanning mode: visible screen rectangles inside the page, in CSS pixels
+        monitors: null,
+        // The frame rate requestAnimationFrame is currently capped at
+        fps: null,
+        // Animation frames run so far (read by the benchmarks)
+        frames: 0,
+        dispatch(batch) {
+            for (const [type, data] of batch) {
+                const handler = handlers[type];
+                if (!handler) continue;
+                try {
+                    handler(data);
+                } catch (e) {
+                    console.error('Mintpaper: ' + type + ' handler failed', e);
+                }
+            }
+        },
+        post: post,
+        // Answered asynchronously through window.updateStatsHistory(samples)
+        requestStatsHistory(seconds) {
+            post({ type: 'stats_history', seconds: seconds === undefined ? null : seconds });
+        },
+    };
+
+    // Preset scripts have defined their hooks by the time the DOM is parsed
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', () => post({ type: 'ready' }), { once: true });
+    } else {
+        post({ type: 'ready' });
+    }
+})();
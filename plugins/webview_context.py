@@ -0,0 +1,182 @@
+import gi
+gi.require_version('WebKit2', '4.1')
+from gi.repository import WebKit2
+from pathlib import Path
+import psutil
+
+from plugins.webview_assets import MintpaperAssetServer, SCHEME
+
+# A wallpaper never navigates, so the browser-oriented default cache only wastes RAM
+CACHE_MODELS = {
+    "document_viewer": WebKit2.CacheModel.DOCUMENT_VIEWER,
+    "document_browser": WebKit2.CacheModel.DOCUMENT_BROWSER,
+    "web_browser": WebKit2.CacheModel.WEB_BROWSER,
+}
+
+DEFAULT_OPTIONS = {
+    "cache_model": "document_viewer",
+    "ephemeral": True,
+    # "shared": every monitor's webview lives in one web process (least RAM)
+    # "per_monitor": one web process per monitor (a crash only blanks one screen)
+    "process_policy": "shared",
+    "memory_limit_mb": 0,          # 0 leaves WebKit's own memory pressure defaults alone
+    "conservative_threshold": 0.33,
+    "strict_threshold": 0.5,
+    # Serve presets through mintpaper:// from a shared in-memory cache (false = plain file://)
+    "asset_scheme": True,
+    "asset_cache_mb": 64,
+}
+
+
+class MintpaperWebContext:
+    """
+    One WebKit2.WebContext and WebsiteDataManager shared by every WebviewPlugin,
+    configured from the "webkit" section of config.json.
+    """
+
+    _shared = None
+
+    @classmethod
+    def get(cls, options=None):
+        if cls._shared is None:
+            cls._shared = cls(options)
+        return cls._shared
+
+    def __init__(self, options=None):
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+
+        if self.options["ephemeral"]:
+            data_manager = WebKit2.WebsiteDataManager.new_ephemeral()
+        else:
+            data_manager = WebKit2.WebsiteDataManager()
+
+        context_props = {"website_data_manager": data_manager}
+        memory_limit = self.options["memory_limit_mb"]
+        if memory_limit and hasattr(WebKit2, "MemoryPressureSettings"):
+            pressure = WebKit2.MemoryPressureSettings.new()
+            pressure.set_memory_limit(memory_limit)
+            pressure.set_conservative_threshold(self.options["conservative_threshold"])
+            pressure.set_strict_threshold(self.options["strict_threshold"])
+            context_props["memory_pressure_settings"] = pressure
+
+        self.data_manager = data_manager
+        self.context = WebKit2.WebContext(**context_props)
+        self.context.set_cache_model(
+            CACHE_MODELS.get(self.options["cache_model"], WebKit2.CacheModel.DOCUMENT_VIEWER)
+        )
+
+        # webview -> {"engine": MintpaperEngine, "pid": int | None}
+        self.views = {}
+
+        self.assets = None
+        if self.options["asset_scheme"]:
+            self.assets = MintpaperAssetServer(self.options["asset_cache_mb"])
+            self.context.register_uri_scheme(SCHEME, self.assets.handle_request)
+            security = self.context.get_security_manager()
+            security.register_uri_scheme_as_secure(SCHEME)
+            security.register_uri_scheme_as_cors_enabled(SCHEME)
+
+    def uri_for(self, file_path):
+        """The URI a preset page should be loaded from."""
+        if self.assets:
+            return self.assets.uri_for(file_path)
+        return Path(file_path).absolute().as_uri()
+
+    def create_view(self, engine, content_manager):
+        """Builds a WebView on the shared context according to the process policy."""
+        props = {"user_content_manager": content_manager}
+        related = next(iter(self.views), None)
+        if self.options["process_policy"] == "shared" and related is not None:
+            # Related views share the web process (and inherit the context)
+            props["related_view"] = related
+        else:
+            props["web_context"] = self.context
+
+        view = WebKit2.WebView(**props)
+        self.views[view] = {"engine": engine, "pid": None}
+        view.connect("load-changed", self._on_load_changed)
+        return view
+
+    def release_view(self, view):
+        self.views.pop(view, None)
+
+    def pid_for(self, view):
+        entry = self.views.get(view)
+        return entry["pid"] if entry else None
+
+    # --- Process accounting ---
+
+    def _on_load_changed(self, view, load_event):
+        if load_event != WebKit2.LoadEvent.COMMITTED:
+            return
+        entry = self.views.get(view)
+        if entry is None or entry["pid"] is not None:
+            return
+
+        # WebKitGTK doesn't expose the web process PID, so we attribute processes
+        # by elimination: a related view shares its relative's process, otherwise
+        # the newest web process nobody has claimed yet belongs to this view.
+        if self.options["process_policy"] == "shared":
+            entry["pid"] = next((e["pid"] for e in self.views.values() if e["pid"]), None)
+        if entry["pid"] is None:
+            claimed = {e["pid"] for e in self.views.values()}
+            candidates = []
+            for proc in self._web_processes():
+                if proc.pid in claimed:
+                    continue
+                try:
+                    candidates.append((proc.create_time(), proc.pid))
+                except psutil.Error:
+                    # Exited since we listed it
+                    continue
+            if candidates:
+                entry["pid"] = max(candidates)[1]
+
+    def _web_processes(self):
+        try:
+            children = psutil.Process().children(recursive=True)
+        except psutil.Error:
+            return []
+        processes = []
+        for proc in children:
+            try:
+                if proc.name().startswith("WebKitWebProces"):
+                    processes.append(proc)
+            except psutil.Error:
+                continue
+        return processes
+
+    def report(self):
+        """Per-engine web process PID and RSS, plus every web process we own."""
+        rows = []
+        for view, entry in self.views.items():
+            engine = entry["engine"]
+            rss_mb = None
+            if entry["pid"]:
+                try:
+                    rss_mb = round(psutil.Process(entry["pid"]).memory_info().rss / (1024 * 1024), 1)
+                except psutil.Error:
+                    pass
+            rows.append({
+                "monitor": engine.mon.get('id'),
+                "preset": engine.mon.get('active_preset_path'),
+                "pid": entry["pid"],
+                "rss_mb": rss_mb,
+            })
+
+        processes = []
+        for proc in self._web_processes():
+            try:
+                processes.append({"pid": proc.pid, "rss_mb": round(proc.memory_info().rss / (1024 * 1024), 1)})
+            except psutil.Error:
+                continue
+
+        return {
+            "policy": self.options["process_policy"],
+            "cache_model": self.options["cache_model"],
+            "assets": self.assets.stats() if self.assets else None,
+            "engines": rows,
+            "web_processes": processes,
+            "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        }
@@ -12,7 +12,6 @@ rm -f "$AUTOSTART_FILE"
 rm -f "$DIR_PATH/startup_error.log"
 
 echo "Step 2: Installing system dependencies..."
-# Added wmctrl and x11-utils because the Coma Tracker requires them for AABB occlusion math
 sudo apt update && sudo apt install -y \
     python3-gi \
     gir1.2-gtk-3.0 \
@@ -20,16 +19,14 @@ sudo apt update && sudo apt install -y \
     gir1.2-ayatanaappindicator3-0.1 \
     mpv \
     libmpv-dev \
-    python3-venv \
-    wmctrl \
-    x11-utils
+    python3-venv
 
 echo "Step 3: Setting up Virtual Environment (with System Bridge)..."
 cd "$DIR_PATH" || exit
 rm -rf venv
 python3 -m venv --system-site-packages venv
 source venv/bin/activate
-pip install psutil pynput python-mpv
+pip install psutil pynput python-mpv python-xlib
 
 echo "Step 4: Creating the robust launch wrapper..."
 # Replaced the old generation block with our dynamic, terminal-friendly launch script
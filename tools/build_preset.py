@@ -0,0 +1,255 @@
+"""
+Builds an optimized copy of a preset: images are downscaled to the largest
+monitor in config.json, re-encoded (lossless WebP unless --quality is given)
+when that is smaller, and references in the preset's HTML/CSS/JS are
+rewritten to the new files. A report of bytes and decode time saved is
+printed and written next to the build.
+
+Run from the repository root (needs Pillow):
+    python -m tools.build_preset presets/Frieren [--out build/presets] [--quality 90]
+"""
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+import time
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".webp"}
+TEXT_EXTENSIONS = {".html", ".htm", ".css", ".js", ".json"}
+DECODE_REPEATS = 5
+
+
+def largest_monitor(config_path):
+    """(w, h) in device pixels of the biggest monitor in config.json, or None."""
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    sizes = []
+    for mon in config.get("monitors", []):
+        geo = mon.get("geometry", {})
+        scale = mon.get("scale_factor", 1) or 1
+        if geo.get("w") and geo.get("h"):
+            sizes.append((geo["w"] * scale, geo["h"] * scale))
+    return max(sizes, key=lambda s: s[0] * s[1]) if sizes else None
+
+
+def decode_ms(data):
+    """Median time to fully decode an encoded image."""
+    times = []
+    for _ in range(DECODE_REPEATS):
+        start = time.perf_counter()
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def fit_scale(size, screen):
+    """
+    Largest downscale that still lets the image cover the whole screen, so
+    "cover"/"contain" layouts never upscale. 1.0 when it is already small enough.
+    """
+    if not screen:
+        return 1.0
+    w, h = size
+    return min(1.0, max(screen[0] / w, screen[1] / h))
+
+
+def encode(img, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        if quality is None:
+            img.save(buffer, "WEBP", lossless=True, method=6)
+        else:
+            img.save(buffer, "WEBP", quality=quality, method=6)
+    elif fmt == "PNG":
+        img.save(buffer, "PNG", optimize=True)
+    else:
+        img.save(buffer, "JPEG", quality=quality or 90, optimize=True)
+    return buffer.getvalue()
+
+
+def build_image(src_path, screen, quality):
+    """Returns (new extension, encoded bytes, report row)."""
+    with open(src_path, 'rb') as f:
+        original = f.read()
+
+    with Image.open(io.BytesIO(original)) as img:
+        img.load()
+        src_size = img.size
+        scale = fit_scale(src_size, screen)
+        if scale < 1.0:
+            img = img.resize((max(1, round(src_size[0] * scale)), max(1, round(src_size[1] * scale))),
+                             Image.LANCZOS)
+
+        # Keep the original format if re-encoding doesn't pay off
+        ext = os.path.splitext(src_path)[1].lower()
+        candidates = [(".webp", encode(img, "WEBP", quality))]
+        if ext == ".png":
+            candidates.append((".png", encode(img, "PNG", None)))
+        if scale == 1.0:
+            candidates.append((ext, original))
+        new_ext, data = min(candidates, key=lambda c: len(c[1]))
+        out_size = img.size
+
+    row = {
+        "bytes_before": len(original),
+        "bytes_after": len(data),
+        "size_before": list(src_size),
+        "size_after": list(out_size),
+        # What the decoded texture costs in memory (RGBA)
+        "texture_bytes_before": src_size[0] * src_size[1] * 4,
+        "texture_bytes_after": out_size[0] * out_size[1] * 4,
+        "decode_ms_before": round(decode_ms(original), 2),
+        "decode_ms_after": round(decode_ms(data), 2),
+    }
+    return new_ext, data, row
+
+
+def unique_name(rel, new_ext, taken):
+    """rel with its new extension, or with the old one folded in (bg-png.webp) if that name is taken."""
+    stem, ext = os.path.splitext(rel)
+    new_rel = stem + new_ext
+    if new_rel == rel or new_rel not in taken:
+        return new_rel
+    new_rel = f"{stem}-{ext.lstrip('.')}{new_ext}"
+    counter = 2
+    while new_rel in taken:
+        new_rel = f"{stem}-{ext.lstrip('.')}-{counter}{new_ext}"
+        counter += 1
+    return new_rel
+
+
+def rewrite_references(text, renames):
+    """Replaces quoted/url() references to renamed files, leaving other text alone."""
+    for old, new in renames.items():
+        pattern = r"(?<=['\"(/])" + re.escape(old) + r"(?=['\")?#])"
+        text = re.sub(pattern, new, text)
+    return text
+
+
+def build_preset(preset_dir, out_root, screen, quality):
+    preset_dir = os.path.abspath(preset_dir)
+    name = os.path.basename(preset_dir.rstrip(os.sep))
+    out_dir = os.path.join(os.path.abspath(out_root), name)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    shutil.copytree(preset_dir, out_dir)
+
+    # Every name in the preset, so a converted image never lands on another file
+    # (bg.png and bg.jpg would both become bg.webp, or clobber an existing bg.webp)
+    taken = {os.path.relpath(os.path.join(root, f), preset_dir)
+             for root, _, files in os.walk(preset_dir) for f in files}
+    basename_counts = {}
+    for rel in taken:
+        basename_counts[os.path.basename(rel)] = basename_counts.get(os.path.basename(rel), 0) + 1
+
+    images, renames = {}, {}
+    for root, _, files in os.walk(preset_dir):
+        for file_name in sorted(files):
+            if os.path.splitext(file_name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            src = os.path.join(root, file_name)
+            rel = os.path.relpath(src, preset_dir)
+            new_ext, data, row = build_image(src, screen, quality)
+
+            new_rel = unique_name(rel, new_ext, taken)
+            taken.add(new_rel)
+            os.remove(os.path.join(out_dir, rel))
+            with open(os.path.join(out_dir, new_rel), 'wb') as f:
+                f.write(data)
+
+            row["file"] = new_rel
+            images[rel] = row
+            if new_rel != rel:
+                # Presets reference files relative to their own folder, or by bare name
+                # when that name can't mean a file in another subfolder
+                renames[rel.replace(os.sep, '/')] = new_rel.replace(os.sep, '/')
+                if basename_counts[os.path.basename(rel)] == 1:
+                    renames.setdefault(os.path.basename(rel), os.path.basename(new_rel))
+
+    for root, _, files in os.walk(out_dir):
+        for file_name in files:
+            if os.path.splitext(file_name)[1].lower() not in TEXT_EXTENSIONS:
+                continue
+            path = os.path.join(root, file_name)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            rewritten = rewrite_references(text, renames)
+            if rewritten != text:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(rewritten)
+
+    totals = {
+        key: round(sum(row[key] for row in images.values()), 2)
+        for key in ("bytes_before", "bytes_after", "texture_bytes_before", "texture_bytes_after",
+                    "decode_ms_before", "decode_ms_after")
+    }
+    report = {
+        "preset": name,
+        "source": preset_dir,
+        "output": out_dir,
+        "target_screen": list(screen) if screen else None,
+        "quality": "lossless" if quality is None else quality,
+        "images": images,
+        "renamed": renames,
+        "totals": totals,
+    }
+    with open(os.path.join(out_dir, "build_report.json"), 'w') as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+def print_report(report):
+    t = report["totals"]
+    print(f"Preset {report['preset']} -> {report['output']}")
+    print(f"  target screen: {report['target_screen'] or 'unknown (no downscaling)'}")
+    for rel, row in report["images"].items():
+        print(f"  {rel:<24} {row['size_before'][0]}x{row['size_before'][1]} -> "
+              f"{row['size_after'][0]}x{row['size_after'][1]}  "
+              f"{row['bytes_before'] / 1024:8.1f} KiB -> {row['bytes_after'] / 1024:8.1f} KiB  "
+              f"decode {row['decode_ms_before']:6.2f} -> {row['decode_ms_after']:6.2f} ms  ({row['file']})")
+    if report["images"]:
+        print(f"  total: {t['bytes_before'] / 1024:.1f} KiB -> {t['bytes_after'] / 1024:.1f} KiB, "
+              f"decode {t['decode_ms_before']:.1f} -> {t['decode_ms_after']:.1f} ms, "
+              f"textures {t['texture_bytes_before'] / 2**20:.1f} -> {t['texture_bytes_after'] / 2**20:.1f} MiB")
+    else:
+        print("  no images to optimize")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('presets', nargs='+', help="preset folders to build")
+    parser.add_argument('--out', default=os.path.join('build', 'presets'), help="output root")
+    parser.add_argument('--config', default='config.json', help="config.json to read monitor sizes from")
+    parser.add_argument('--max-size', metavar='WxH', help="target screen size instead of the largest monitor")
+    parser.add_argument('--quality', type=int, help="lossy WebP quality (default: lossless)")
+    args = parser.parse_args()
+
+    if Image is None:
+        sys.exit("build_preset needs Pillow: pip install pillow")
+
+    if args.max_size:
+        w, h = args.max_size.lower().split('x')
+        screen = (int(w), int(h))
+    else:
+        screen = largest_monitor(args.config)
+
+    for preset in args.presets:
+        print_report(build_preset(preset, args.out, screen, args.quality))
+
+
+if __name__ == '__main__':
+    main()
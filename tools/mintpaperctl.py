@@ -0,0 +1,60 @@
+"""
+Queries and controls a running Mintpaper engine through its control socket.
+
+Needs only the standard library. Run from the repository root:
+    python -m tools.mintpaperctl metrics
+    python -m tools.mintpaperctl status
+    python -m tools.mintpaperctl pause all | resume 0 | reload 1
+    python -m tools.mintpaperctl load 0 presets/Frieren/index.html
+"""
+import argparse
+import os
+import socket
+import sys
+
+from engine.control_protocol import COMMANDS, default_socket_path
+
+
+def send(path, line, timeout=5.0):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(path)
+        client.sendall(line.encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        client.close()
+    return b"".join(chunks).decode("utf-8", "replace")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('args', nargs='*', help="monitor id (or 'all'), and a preset path for load")
+    parser.add_argument('--socket', default=default_socket_path(), help="control socket path")
+    args = parser.parse_args()
+
+    words = list(args.args)
+    if args.command == "load" and len(words) == 2:
+        # The engine resolves paths from its own working directory
+        words[1] = os.path.abspath(words[1])
+
+    try:
+        reply = send(args.socket, " ".join([args.command] + words))
+    except FileNotFoundError:
+        sys.exit(f"No engine listening on {args.socket}")
+    except OSError as e:
+        sys.exit(f"Couldn't talk to the engine on {args.socket} ({e})")
+
+    sys.stdout.write(reply)
+    if reply.startswith("error:"):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
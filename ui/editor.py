@@ -3,6 +3,8 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
 from pathlib import Path
 
+from engine.window import SETTING_KEYS
+
 class MintpaperEditor(Gtk.Window):
     def __init__(self, app_ref):
         super().__init__(title="Mintpaper Editor")
@@ -20,12 +22,9 @@ class MintpaperEditor(Gtk.Window):
         mon_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         mon_label = Gtk.Label(label="Target Monitor:")
         
+        self._shown_engine = None
         self.mon_combo = Gtk.ComboBoxText()
-        for i, engine in enumerate(self.app_ref.engines):
-            geo = engine.mon.get('geometry', {})
-            self.mon_combo.append_text(f"Monitor {i} ({geo.get('w', 0)}x{geo.get('h', 0)})")
-            
-        self.mon_combo.set_active(0)
+        self.populate_monitors()
         self.mon_combo.connect("changed", self.on_monitor_changed)
         
         mon_box.pack_start(mon_label, False, False, 0)
@@ -61,6 +60,25 @@ class MintpaperEditor(Gtk.Window):
         self.hide()
         return True
 
+    def populate_monitors(self, selected_engine=None):
+        """(Re)fills the monitor combo from app.engines, e.g. after a hot-plug."""
+        self.mon_combo.remove_all()
+        active = 0
+        for i, engine in enumerate(self.app_ref.engines):
+            geo = engine.mon.get('geometry', {})
+            if 'monitor_ids' in engine.mon:
+                self.mon_combo.append_text(f"Spanning {engine.mon['monitor_ids']} ({geo.get('w', 0)}x{geo.get('h', 0)})")
+            else:
+                self.mon_combo.append_text(f"Monitor {i} ({geo.get('w', 0)}x{geo.get('h', 0)})")
+            if engine is selected_engine:
+                active = i
+
+        self.mon_combo.set_active(active if self.app_ref.engines else -1)
+
+    def refresh_monitors(self):
+        # Stay on the same engine if it survived the change (the combo's "changed" redraws the controls)
+        self.populate_monitors(self._shown_engine)
+
     def get_selected_monitor_index(self):
         return self.mon_combo.get_active()
 
@@ -83,6 +101,7 @@ class MintpaperEditor(Gtk.Window):
             return
             
         engine = self.app_ref.engines[mon_idx]
+        self._shown_engine = engine
         plugin = engine.plugin
         
         # Sync the file picker text to match this monitor's current wallpaper
@@ -188,19 +207,24 @@ class MintpaperEditor(Gtk.Window):
         return box
 
     # --- Event Dispatchers to Plugins ---
-    
+    # Engine settings go through the config store, which persists them and
+    # notifies the engine; anything else only lives in the plugin's settings.
+
+    def _set_setting(self, plugin, prop_name, value):
+        key = SETTING_KEYS.get(prop_name)
+        if key is None:
+            plugin.settings[prop_name] = value
+            return
+        self.app_ref.config_store.update(plugin.engine.mon, key, value)
+
     def on_slider_changed(self, plugin, prop_name, value):
-        plugin.settings[prop_name] = int(value)
-        if prop_name == 'fps_limit':
-            plugin.engine.handle_event("SET_FPS", {"fps": int(value)})
+        self._set_setting(plugin, prop_name, int(value))
 
     def on_mute_toggled(self, plugin, prop_name, is_active):
-        plugin.settings[prop_name] = is_active
-        plugin.engine.handle_event("SET_MUTED", {"should_mute": is_active})
+        self._set_setting(plugin, prop_name, is_active)
 
     def on_volume_changed(self, plugin, prop_name, value):
-        plugin.settings[prop_name] = int(value)
-        plugin.engine.handle_event("SET_VOLUME", {"volume": int(value)})
+        self._set_setting(plugin, prop_name, int(value))
 
     def on_file_changed(self, plugin, prop_name, file_path):
         if file_path: